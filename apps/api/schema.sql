@@ -20,20 +20,23 @@ CREATE TABLE IF NOT EXISTS marketplaces (
     name VARCHAR(100) NOT NULL,
     base_url VARCHAR(500) NOT NULL,
     is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_marketplace_name (name)
 );
 
 -- Items table
 CREATE TABLE IF NOT EXISTS items (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(500) NOT NULL,
+    normalized_name VARCHAR(500),
     description TEXT,
     category VARCHAR(100),
     brand VARCHAR(100),
     model VARCHAR(100),
     image_url VARCHAR(1000),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_items_normalized_name (normalized_name)
 );
 
 -- Price data table
@@ -51,6 +54,43 @@ CREATE TABLE IF NOT EXISTS price_data (
     UNIQUE KEY unique_item_marketplace_timestamp (item_id, marketplace_id, timestamp)
 );
 
+-- Latest price per item, maintained by the price_data triggers below
+CREATE TABLE IF NOT EXISTS item_latest_price (
+    item_id INT PRIMARY KEY,
+    price DECIMAL(10,2) NOT NULL,
+    marketplace_id INT NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+    FOREIGN KEY (marketplace_id) REFERENCES marketplaces(id) ON DELETE CASCADE
+);
+
+-- Keep item_latest_price current; timestamp is assigned last so the comparisons above it see the old value
+DROP TRIGGER IF EXISTS price_data_latest_price;
+CREATE TRIGGER price_data_latest_price AFTER INSERT ON price_data
+FOR EACH ROW
+    INSERT INTO item_latest_price (item_id, price, marketplace_id, timestamp)
+    VALUES (NEW.item_id, NEW.price, NEW.marketplace_id, NEW.timestamp)
+    ON DUPLICATE KEY UPDATE
+        price = IF(VALUES(timestamp) >= timestamp, VALUES(price), price),
+        marketplace_id = IF(VALUES(timestamp) >= timestamp, VALUES(marketplace_id), marketplace_id),
+        timestamp = GREATEST(timestamp, VALUES(timestamp));
+
+-- Updated rows (including the update branch of INSERT ... ON DUPLICATE KEY UPDATE, which fires
+-- no insert trigger) can change which row is latest, so the item's latest price is re-read
+DROP TRIGGER IF EXISTS price_data_latest_price_update;
+CREATE TRIGGER price_data_latest_price_update AFTER UPDATE ON price_data
+FOR EACH ROW
+    INSERT INTO item_latest_price (item_id, price, marketplace_id, timestamp)
+    SELECT item_id, price, marketplace_id, timestamp
+    FROM price_data
+    WHERE item_id = NEW.item_id
+    ORDER BY timestamp DESC, id DESC
+    LIMIT 1
+    ON DUPLICATE KEY UPDATE
+        price = VALUES(price),
+        marketplace_id = VALUES(marketplace_id),
+        timestamp = VALUES(timestamp);
+
 -- Watchlist table
 CREATE TABLE IF NOT EXISTS watchlist (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -75,6 +115,72 @@ CREATE TABLE IF NOT EXISTS price_alerts (
     FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
 );
 
+-- Migration: marketplaces and items created before their unique keys existed.
+-- Duplicates are merged into the oldest row (references re-pointed, then the extra rows
+-- deleted) so the keys can be added; every step is a no-op on an up-to-date database.
+CREATE TEMPORARY TABLE marketplace_merge AS
+SELECT m.id as duplicate_id, k.keep_id
+FROM marketplaces m
+JOIN (SELECT name, MIN(id) as keep_id FROM marketplaces GROUP BY name HAVING COUNT(*) > 1) k
+  ON k.name = m.name AND m.id <> k.keep_id;
+UPDATE IGNORE price_data pd JOIN marketplace_merge mm ON pd.marketplace_id = mm.duplicate_id
+SET pd.marketplace_id = mm.keep_id;
+UPDATE item_latest_price lp JOIN marketplace_merge mm ON lp.marketplace_id = mm.duplicate_id
+SET lp.marketplace_id = mm.keep_id;
+DELETE m FROM marketplaces m JOIN marketplace_merge mm ON m.id = mm.duplicate_id;
+DROP TEMPORARY TABLE marketplace_merge;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'marketplaces' AND INDEX_NAME = 'unique_marketplace_name') = 0,
+    'ALTER TABLE marketplaces ADD UNIQUE KEY unique_marketplace_name (name)',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'items' AND COLUMN_NAME = 'normalized_name') = 0,
+    'ALTER TABLE items ADD COLUMN normalized_name VARCHAR(500) AFTER name',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
+-- Same normalization as normalizeItemName in src/utils/priceRecorder.js
+UPDATE items
+SET normalized_name = LEFT(LOWER(TRIM(REGEXP_REPLACE(name, '[[:space:]]+', ' '))), 500)
+WHERE normalized_name IS NULL;
+
+CREATE TEMPORARY TABLE item_merge AS
+SELECT i.id as duplicate_id, k.keep_id
+FROM items i
+JOIN (
+    SELECT normalized_name, MIN(id) as keep_id
+    FROM items
+    WHERE normalized_name IS NOT NULL
+    GROUP BY normalized_name
+    HAVING COUNT(*) > 1
+) k ON k.normalized_name = i.normalized_name AND i.id <> k.keep_id;
+UPDATE IGNORE watchlist w JOIN item_merge im ON w.item_id = im.duplicate_id SET w.item_id = im.keep_id;
+UPDATE IGNORE price_data pd JOIN item_merge im ON pd.item_id = im.duplicate_id SET pd.item_id = im.keep_id;
+UPDATE price_alerts pa JOIN item_merge im ON pa.item_id = im.duplicate_id SET pa.item_id = im.keep_id;
+DELETE i FROM items i JOIN item_merge im ON i.id = im.duplicate_id;
+DROP TEMPORARY TABLE item_merge;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'items' AND INDEX_NAME = 'unique_items_normalized_name') = 0,
+    'ALTER TABLE items ADD UNIQUE KEY unique_items_normalized_name (normalized_name)',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
 -- Insert sample marketplaces
 INSERT INTO marketplaces (name, base_url) VALUES
 ('Amazon', 'https://amazon.com'),
@@ -85,12 +191,12 @@ INSERT INTO marketplaces (name, base_url) VALUES
 ON DUPLICATE KEY UPDATE name = VALUES(name);
 
 -- Insert sample items
-INSERT INTO items (name, description, category, brand, model) VALUES
-('iPhone 15 Pro', 'Latest iPhone with A17 Pro chip', 'Electronics', 'Apple', 'iPhone 15 Pro'),
-('MacBook Air M2', '13-inch MacBook Air with M2 chip', 'Electronics', 'Apple', 'MacBook Air M2'),
-('Samsung Galaxy S24', 'Flagship Android smartphone', 'Electronics', 'Samsung', 'Galaxy S24'),
-('Sony WH-1000XM5', 'Noise-canceling headphones', 'Electronics', 'Sony', 'WH-1000XM5'),
-('Nintendo Switch', 'Gaming console', 'Electronics', 'Nintendo', 'Switch')
+INSERT INTO items (name, normalized_name, description, category, brand, model) VALUES
+('iPhone 15 Pro', 'iphone 15 pro', 'Latest iPhone with A17 Pro chip', 'Electronics', 'Apple', 'iPhone 15 Pro'),
+('MacBook Air M2', 'macbook air m2', '13-inch MacBook Air with M2 chip', 'Electronics', 'Apple', 'MacBook Air M2'),
+('Samsung Galaxy S24', 'samsung galaxy s24', 'Flagship Android smartphone', 'Electronics', 'Samsung', 'Galaxy S24'),
+('Sony WH-1000XM5', 'sony wh-1000xm5', 'Noise-canceling headphones', 'Electronics', 'Sony', 'WH-1000XM5'),
+('Nintendo Switch', 'nintendo switch', 'Gaming console', 'Electronics', 'Nintendo', 'Switch')
 ON DUPLICATE KEY UPDATE name = VALUES(name);
 
 -- Insert sample price data
@@ -103,6 +209,35 @@ INSERT INTO price_data (item_id, marketplace_id, price, currency, availability,
 (3, 4, 799.99, 'USD', 'In Stock', 'https://bestbuy.com/galaxy-s24')
 ON DUPLICATE KEY UPDATE price = VALUES(price);
 
+-- Migration: backfill item_latest_price from price_data, which is authoritative (rows written
+-- before the triggers existed, or changed by the merges above)
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'price_data' AND INDEX_NAME = 'idx_price_data_item_timestamp') = 0,
+    'CREATE INDEX idx_price_data_item_timestamp ON price_data(item_id, timestamp)',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
+INSERT INTO item_latest_price (item_id, price, marketplace_id, timestamp)
+SELECT item_id, price, marketplace_id, timestamp
+FROM (
+    SELECT
+        item_id,
+        price,
+        marketplace_id,
+        timestamp,
+        ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY timestamp DESC, id DESC) as rn
+    FROM price_data
+) latest
+WHERE rn = 1
+ON DUPLICATE KEY UPDATE
+    price = VALUES(price),
+    marketplace_id = VALUES(marketplace_id),
+    timestamp = VALUES(timestamp);
+
 -- Prophet ML Tables for Price Forecasting
 -- Products table (simplified for Prophet)
 CREATE TABLE IF NOT EXISTS products (
@@ -123,6 +258,16 @@ CREATE TABLE IF NOT EXISTS price_history (
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
 );
 
+-- Regularized daily price series (one row per product per day, gaps filled) for training
+CREATE TABLE IF NOT EXISTS price_history_daily (
+    product_id INT NOT NULL,
+    ds DATE NOT NULL,
+    price DECIMAL(10,2) NOT NULL,
+    is_filled BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (product_id, ds),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
 -- Forecasts table for Prophet predictions
 CREATE TABLE IF NOT EXISTS forecasts (
     product_id INT NOT NULL,
@@ -136,6 +281,18 @@ CREATE TABLE IF NOT EXISTS forecasts (
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
 );
 
+-- Content hash per forecast chunk, so reruns of a model version only rewrite changed rows
+CREATE TABLE IF NOT EXISTS forecast_chunk_hashes (
+    product_id INT NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+    chunk_index INT NOT NULL,
+    row_count INT NOT NULL,
+    content_hash CHAR(40) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (product_id, model_version, chunk_index),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
 -- Model metadata table
 CREATE TABLE IF NOT EXISTS model_metadata (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -146,12 +303,155 @@ CREATE TABLE IF NOT EXISTS model_metadata (
     training_data_end DATE,
     model_params JSON,
     performance_metrics JSON,
+    artifact_uri VARCHAR(1000),
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
     UNIQUE KEY unique_product_model (product_id, model_version)
 );
 
+-- Migration: model_metadata created before artifact_uri existed (MySQL has no ADD COLUMN IF NOT EXISTS)
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'model_metadata' AND COLUMN_NAME = 'artifact_uri') = 0,
+    'ALTER TABLE model_metadata ADD COLUMN artifact_uri VARCHAR(1000) AFTER performance_metrics',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
+-- Per-product overview row maintained by the ingestion and training jobs
+CREATE TABLE IF NOT EXISTS product_forecast_summary (
+    product_id INT PRIMARY KEY,
+    last_price DECIMAL(10,2),
+    last_price_date DATE,
+    next_prediction_date DATE,
+    next_predicted_price DECIMAL(10,2),
+    forecast_7d DECIMAL(10,2),
+    forecast_30d DECIMAL(10,2),
+    forecast_as_of DATE,
+    model_version VARCHAR(50),
+    performance_metrics JSON,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Migration: product_forecast_summary created before forecast_as_of existed
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'product_forecast_summary' AND COLUMN_NAME = 'forecast_as_of') = 0,
+    'ALTER TABLE product_forecast_summary ADD COLUMN forecast_as_of DATE AFTER forecast_30d',
+    'DO 0'
+);
+PREPARE migration FROM @ddl;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
+-- Backfill: summary rows for every product (same queries as jobs/forecast_summary.py).
+-- Safe to re-run; the daily `ingest_dataset.py --rebuild-summary` keeps them current
+INSERT INTO product_forecast_summary (product_id, last_price, last_price_date)
+SELECT ph.product_id, ph.price, ph.ds
+FROM price_history ph
+JOIN (
+    SELECT product_id, MAX(ds) as ds
+    FROM price_history
+    GROUP BY product_id
+) latest ON latest.product_id = ph.product_id AND latest.ds = ph.ds
+ON DUPLICATE KEY UPDATE
+    last_price = VALUES(last_price),
+    last_price_date = VALUES(last_price_date);
+
+INSERT INTO product_forecast_summary (
+    product_id, model_version, performance_metrics,
+    next_prediction_date, next_predicted_price, forecast_7d, forecast_30d, forecast_as_of
+)
+SELECT
+    mm.product_id, mm.model_version, mm.performance_metrics,
+    nxt.ds, nxt.yhat, f7.yhat, f30.yhat, CURDATE()
+FROM model_metadata mm
+LEFT JOIN (
+    SELECT product_id, model_version, MIN(ds) as ds
+    FROM forecasts
+    WHERE ds >= CURDATE()
+    GROUP BY product_id, model_version
+) first_day ON first_day.product_id = mm.product_id AND first_day.model_version = mm.model_version
+LEFT JOIN forecasts nxt
+    ON nxt.product_id = mm.product_id AND nxt.model_version = mm.model_version AND nxt.ds = first_day.ds
+LEFT JOIN forecasts f7
+    ON f7.product_id = mm.product_id AND f7.model_version = mm.model_version
+    AND f7.ds = CURDATE() + INTERVAL 7 DAY
+LEFT JOIN forecasts f30
+    ON f30.product_id = mm.product_id AND f30.model_version = mm.model_version
+    AND f30.ds = CURDATE() + INTERVAL 30 DAY
+WHERE mm.is_active = 1
+ON DUPLICATE KEY UPDATE
+    model_version = VALUES(model_version),
+    performance_metrics = VALUES(performance_metrics),
+    next_prediction_date = VALUES(next_prediction_date),
+    next_predicted_price = VALUES(next_predicted_price),
+    forecast_7d = VALUES(forecast_7d),
+    forecast_30d = VALUES(forecast_30d),
+    forecast_as_of = VALUES(forecast_as_of);
+
+-- Ingestion checkpoints: committed row/byte offset per source file and write partition
+CREATE TABLE IF NOT EXISTS ingest_progress (
+    source VARCHAR(512) NOT NULL,
+    part VARCHAR(64) NOT NULL,
+    row_offset BIGINT NOT NULL DEFAULT 0,
+    byte_offset BIGINT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, part)
+);
+
+-- Training run registry: one row per run, one item per product it set out to train
+CREATE TABLE IF NOT EXISTS training_runs (
+    run_id VARCHAR(64) PRIMARY KEY,
+    mode VARCHAR(20) NOT NULL DEFAULT 'local',
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    total_products INT NOT NULL DEFAULT 0,
+    successful INT,
+    failed INT,
+    skipped INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS training_run_items (
+    run_id VARCHAR(64) NOT NULL,
+    product_id INT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    model_version VARCHAR(50),
+    duration_seconds DOUBLE,
+    error TEXT,
+    finished_at TIMESTAMP NULL,
+    PRIMARY KEY (run_id, product_id),
+    INDEX idx_training_run_items_product (product_id, status, finished_at),
+    FOREIGN KEY (run_id) REFERENCES training_runs(run_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Distributed training work queue: one leasable batch of fit units per row
+CREATE TABLE IF NOT EXISTS training_leases (
+    run_id VARCHAR(64) NOT NULL,
+    batch_index INT NOT NULL,
+    units JSON NOT NULL,
+    product_count INT NOT NULL,
+    priority INT NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    worker_id VARCHAR(128),
+    attempts INT NOT NULL DEFAULT 0,
+    lease_expires_at TIMESTAMP NULL,
+    successful INT,
+    failed INT,
+    errors JSON,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, batch_index),
+    INDEX idx_training_leases_claim (run_id, status, priority, lease_expires_at)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_price_data_item_id ON price_data(item_id);
 CREATE INDEX idx_price_data_marketplace_id ON price_data(marketplace_id);
@@ -0,0 +1,90 @@
+import { describe, it, expect, beforeEach, jest } from '@jest/globals';
+import { createPriceRecorder, normalizeItemName } from '../utils/priceRecorder.js';
+
+describe('priceRecorder', () => {
+  let pool;
+  let recorder;
+
+  // Rows keyed like utf8mb4_0900_ai_ci compares them: case- and accent-insensitive
+  const fold = (value) => value.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+  let tables;
+
+  beforeEach(() => {
+    tables = { marketplaces: new Map(), items: new Map() };
+    let nextId = 1;
+    const insert = (table, name) => {
+      if (!tables[table].has(fold(name))) tables[table].set(fold(name), { id: nextId++, stored: name });
+    };
+
+    pool = {
+      query: jest.fn(async (sql, values) => {
+        if (sql.startsWith('INSERT IGNORE INTO marketplaces')) {
+          if (values[0].some(([name]) => name.length > 100)) throw new Error('Data too long for column name');
+          values[0].forEach(([name]) => insert('marketplaces', name));
+          return [{ affectedRows: values[0].length }];
+        }
+        if (sql.startsWith('INSERT INTO items')) {
+          values[0].forEach(([, normalizedName]) => insert('items', normalizedName));
+          return [{ affectedRows: values[0].length }];
+        }
+        if (sql.startsWith('SELECT ? AS input')) {
+          const table = sql.includes('FROM marketplaces') ? 'marketplaces' : 'items';
+          const inputs = values.filter((_, i) => i % 2 === 0);
+          return [inputs.map(input => ({ input, id: tables[table].get(fold(input))?.id ?? null }))];
+        }
+        return [{ affectedRows: values[0].length }];
+      })
+    };
+    recorder = createPriceRecorder(pool, { batchSize: 100 });
+  });
+
+  const result = (name, source, price) => ({ name, source, price, product_link: 'https://example.com/p', thumbnail: null });
+
+  it('normalizes item names', () => {
+    expect(normalizeItemName(' Sony  WH-1000XM5 ')).toBe('sony wh-1000xm5');
+  });
+
+  it('writes queued prices in one batch', async () => {
+    recorder.record([result('Desk Lamp', 'Amazon', 20), result('desk lamp', 'eBay', 18), result('Chair', 'Amazon', null)]);
+    await recorder.flush();
+
+    const priceInsert = pool.query.mock.calls.find(([sql]) => sql.includes('INTO price_data'));
+    expect(priceInsert[1][0].length).toBe(2);
+    expect(recorder.stats()).toMatchObject({ queued: 2, written: 2, batches: 1, pending: 0 });
+  });
+
+  it('caches marketplace ids between batches', async () => {
+    recorder.record([result('Desk Lamp', 'Amazon', 20)]);
+    await recorder.flush();
+    recorder.record([result('Chair', 'Amazon', 45)]);
+    await recorder.flush();
+
+    const lookups = pool.query.mock.calls.filter(([sql]) => sql.includes('INTO marketplaces'));
+    expect(lookups.length).toBe(1);
+  });
+
+  it('resolves names stored with a different case or accents', async () => {
+    tables.marketplaces.set('ebay', { id: 50, stored: 'eBay' });
+    tables.items.set('pokemon cards', { id: 60, stored: 'pokemon cards' });
+
+    recorder.record([result('Pokémon  Cards', 'EBAY', 12), result('x'.repeat(10), 'S'.repeat(150), 5)]);
+    await recorder.flush();
+
+    const priceInsert = pool.query.mock.calls.find(([sql]) => sql.includes('INTO price_data'));
+    const rows = priceInsert[1][0];
+    expect(rows.length).toBe(2);
+    expect(rows[0][0]).toBe(60);
+    expect(rows[0][1]).toBe(50);
+    expect(recorder.stats()).toMatchObject({ written: 2 });
+  });
+
+  it('keeps going after a failed batch', async () => {
+    pool.query.mockRejectedValueOnce(new Error('connection lost'));
+    recorder.record([result('Desk Lamp', 'Amazon', 20)]);
+    await recorder.flush();
+
+    recorder.record([result('Desk Lamp', 'Amazon', 21)]);
+    await recorder.flush();
+    expect(recorder.stats()).toMatchObject({ failedBatches: 1, batches: 1, written: 1 });
+  });
+});
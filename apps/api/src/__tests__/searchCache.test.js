@@ -0,0 +1,93 @@
+import { describe, it, expect, beforeEach, jest } from '@jest/globals';
+import { createSearchCache, normalizeQuery } from '../utils/searchCache.js';
+
+describe('searchCache', () => {
+  let clock;
+  let getJson;
+  let cache;
+
+  const now = () => clock;
+
+  beforeEach(() => {
+    clock = 0;
+    getJson = jest.fn(async (params) => ({ engine: params.engine, fetchedAt: clock }));
+    cache = createSearchCache(getJson, { ttlMs: 1000, staleMs: 1000, maxEntries: 2, now });
+  });
+
+  it('normalizes queries', () => {
+    expect(normalizeQuery('  iPhone   15 ')).toBe('iphone 15');
+  });
+
+  it('serves repeat queries from the cache', async () => {
+    await cache.get('amazon', 'iPhone 15', { engine: 'amazon' });
+    const result = await cache.get('amazon', 'iphone  15', { engine: 'amazon' });
+
+    expect(result.engine).toBe('amazon');
+    expect(getJson).toHaveBeenCalledTimes(1);
+    expect(cache.stats()).toMatchObject({ hits: 1, misses: 1, size: 1, hitRate: 0.5 });
+  });
+
+  it('keys entries per engine', async () => {
+    await cache.get('amazon', 'tv', { engine: 'amazon' });
+    await cache.get('ebay', 'tv', { engine: 'ebay' });
+
+    expect(getJson).toHaveBeenCalledTimes(2);
+  });
+
+  it('coalesces concurrent identical queries into one request', async () => {
+    let resolve;
+    getJson.mockImplementationOnce(() => new Promise(r => { resolve = r; }));
+
+    const first = cache.get('ebay', 'lamp', { engine: 'ebay' });
+    const second = cache.get('ebay', 'Lamp', { engine: 'ebay' });
+    resolve({ engine: 'ebay' });
+
+    expect(await first).toBe(await second);
+    expect(getJson).toHaveBeenCalledTimes(1);
+    expect(cache.stats()).toMatchObject({ misses: 1, coalesced: 1 });
+  });
+
+  it('serves stale entries while refreshing in the background', async () => {
+    await cache.get('amazon', 'desk', { engine: 'amazon' });
+    clock = 1500;
+
+    const stale = await cache.get('amazon', 'desk', { engine: 'amazon' });
+    expect(stale.fetchedAt).toBe(0);
+    expect(getJson).toHaveBeenCalledTimes(2);
+
+    await new Promise(r => setImmediate(r));
+    const refreshed = await cache.get('amazon', 'desk', { engine: 'amazon' });
+    expect(refreshed.fetchedAt).toBe(1500);
+    expect(cache.stats()).toMatchObject({ staleHits: 1, refreshes: 1, hits: 1 });
+  });
+
+  it('refetches entries past the stale window', async () => {
+    await cache.get('amazon', 'desk', { engine: 'amazon' });
+    clock = 2500;
+
+    const result = await cache.get('amazon', 'desk', { engine: 'amazon' });
+    expect(result.fetchedAt).toBe(2500);
+    expect(cache.stats()).toMatchObject({ misses: 2, staleHits: 0 });
+  });
+
+  it('evicts the least recently used entry', async () => {
+    await cache.get('amazon', 'a', { engine: 'amazon' });
+    await cache.get('amazon', 'b', { engine: 'amazon' });
+    await cache.get('amazon', 'a', { engine: 'amazon' });
+    await cache.get('amazon', 'c', { engine: 'amazon' });
+    await cache.get('amazon', 'a', { engine: 'amazon' });
+
+    expect(getJson).toHaveBeenCalledTimes(3);
+    expect(cache.stats()).toMatchObject({ size: 2, evictions: 1 });
+  });
+
+  it('does not cache failed requests', async () => {
+    getJson.mockRejectedValueOnce(new Error('quota exceeded'));
+
+    await expect(cache.get('ebay', 'chair', { engine: 'ebay' })).rejects.toThrow('quota exceeded');
+    await cache.get('ebay', 'chair', { engine: 'ebay' });
+
+    expect(getJson).toHaveBeenCalledTimes(2);
+    expect(cache.stats()).toMatchObject({ errors: 1, size: 1 });
+  });
+});
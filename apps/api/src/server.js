@@ -6,7 +6,9 @@ import mysql from 'mysql2/promise';
 import dotenv from 'dotenv';
 import jwt from 'jsonwebtoken';
 import {hash, compare} from './utils/pass.js';
-import {cleanResults, searchFilter} from './utils/searchHelper.js';
+import {cleanResults, searchFilter, sortByPrice, withDeadline} from './utils/searchHelper.js';
+import {createSearchCache} from './utils/searchCache.js';
+import {createPriceRecorder, normalizeItemName} from './utils/priceRecorder.js';
 import {getJson} from 'serpapi';
 import { 
   getAvailableProducts, 
@@ -39,6 +41,26 @@ const pool = mysql.createPool(dbConfig);
 
 const app = express();
 
+// Prices from search results, written to price_data in the background (see utils/priceRecorder.js)
+const priceRecorder = createPriceRecorder(pool);
+priceRecorder.start();
+
+// Raw SerpAPI responses shared by identical searches (see utils/searchCache.js).
+// Each external fetch is recorded as a price observation; cache hits are not recorded again.
+const searchCache = createSearchCache(async (params) => {
+  const result = await getJson(params);
+  try {
+    priceRecorder.record(cleanResults(params.engine, result));
+  } catch (e) {
+    console.error('Price recording error:', e.message);
+  }
+  return result;
+}, {
+  ttlMs: parseInt(process.env.SEARCH_CACHE_TTL_MS || '600000'),
+  staleMs: parseInt(process.env.SEARCH_CACHE_STALE_MS || '3000000'),
+  maxEntries: parseInt(process.env.SEARCH_CACHE_MAX_ENTRIES || '500')
+});
+
 // JWT Secret (in production, use environment variable)
 const JWT_SECRET = process.env.JWT_SECRET || 'your-secret-key-change-in-production';
 
@@ -61,7 +83,7 @@ const authenticateToken = async (req, res, next) => {
 };
 
 // Middleware
-app.use(cors());
+app.use(cors({ exposedHeaders: ['X-Search-Missing-Engines'] }));
 app.use(helmet());
 app.use(express.json());
 
@@ -161,15 +183,7 @@ app.get('/api/items', async (req, res) => {
         pd.marketplace_id,
         pd.timestamp as last_price_timestamp
       FROM items i
-      LEFT JOIN (
-        SELECT 
-          item_id,
-          price,
-          marketplace_id,
-          timestamp,
-          ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY timestamp DESC) as rn
-        FROM price_data
-      ) pd ON i.id = pd.item_id AND pd.rn = 1
+      LEFT JOIN item_latest_price pd ON pd.item_id = i.id
       ORDER BY i.created_at DESC
     `);
     
@@ -214,61 +228,112 @@ app.get('/api/items/:id', async (req, res) => {
 });
 
 // Search route
+const SEARCH_ENGINES = ["google_shopping", "amazon", "ebay"];
+const SEARCH_ENGINE_TIMEOUT_MS = parseInt(process.env.SEARCH_ENGINE_TIMEOUT_MS || '8000');
+
+// Cleaned results of one engine, or its status if it failed or missed the deadline
+async function searchEngine(engine, q, limit) {
+	const params = {
+		engine,
+		api_key: process.env.SERPAPI_KEY,
+		hl: "en",
+		gl: "us"
+	};
+
+	if (engine === "amazon") {
+		params["k"] = q;
+	} else if (engine === "ebay") {
+		params["_nkw"] = q;
+	} else {
+		params["q"] = q;
+	}
+
+	// A request past the deadline keeps running and still fills the cache for the next search
+	const request = searchCache.get(engine, q, params)
+		.then(result => ({ engine, status: 'ok', items: cleanResults(engine, result, limit) }))
+		.catch(e => {
+			console.error(`API error fetching from ${engine}:`, e.message);
+			return { engine, status: 'error', items: [] };
+		});
+	return withDeadline(request, SEARCH_ENGINE_TIMEOUT_MS, { engine, status: 'timeout', items: [] });
+}
+
+function mergeEngineResults(q, engineResults) {
+	const merged = engineResults.flatMap(result => result.items);
+	return sortByPrice(searchFilter(q, merged, true));
+}
+
+// Streams one frame per engine as it answers, then the filtered, price-sorted results
+async function streamSearch(req, res, q, limit, format) {
+	let closed = false;
+	req.on('close', () => { closed = true; });
+
+	res.status(200);
+	if (format === 'sse') {
+		res.set({ 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'Connection': 'keep-alive' });
+	} else {
+		res.set({ 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-cache' });
+	}
+	res.flushHeaders();
+
+	const send = (type, data) => {
+		if (closed) return;
+		if (format === 'sse') {
+			res.write(`event: ${type}\ndata: ${JSON.stringify(data)}\n\n`);
+		} else {
+			res.write(JSON.stringify({ type, ...data }) + '\n');
+		}
+	};
+
+	const engineResults = await Promise.all(SEARCH_ENGINES.map(async (engine) => {
+		const result = await searchEngine(engine, q, limit);
+		send('engine', result);
+		return result;
+	}));
+
+	send('results', {
+		missing: engineResults.filter(result => result.status !== 'ok').map(result => result.engine),
+		items: mergeEngineResults(q, engineResults)
+	});
+	res.end();
+}
+
 app.get('/api/search', async (req, res) => {
 		
   try {
-		const { q, limit = 10 } = req.query;
+		const { q, limit = 10, stream } = req.query;
     if (!q) {
 		return res.status(400).json({ error: 'Search query required' });
     }
-	
-	const engines = ["google_shopping","amazon", "ebay"]
-
-	const results = await Promise.all(engines.map( async (engine) => {
-				const params = {
-				engine,
-				api_key: process.env.SERPAPI_KEY,
-				hl: "en",
-				gl: "us"
-			};
-			
-			if (engine === "amazon") {
-				params["k"] = q;
-			} else if (engine === "ebay") {
-				params["_nkw"] = q;
-			} else {
-				params["q"] = q;
-			}
-			
-			try {
-				return await getJson(params);
-			} catch (e) {
-				console.error(`API error fetching from ${engine}:`, e.message);
-				return null;
-			}
-		})
-	);
-
-	const items = {};
-	results.forEach((result, i) => {
-		if (!result) return;
-		items[engines[i]] = cleanResults(engines[i], result, limit);
-	});
 
-	const merged = Object.values(items).flat()
-	const filtered = searchFilter(q, merged, true)
-	filtered.sort((a,b) => {
-		if (a.price == null) return 1;
-		if (b.price ==null) return -1;
-		return a.price - b.price;
-	});
-    res.json(filtered);
+	if (stream) {
+		if (stream !== 'ndjson' && stream !== 'sse') {
+			return res.status(400).json({ error: 'stream must be ndjson or sse' });
+		}
+		return await streamSearch(req, res, q, limit, stream);
+	}
+
+	const engineResults = await Promise.all(SEARCH_ENGINES.map(engine => searchEngine(engine, q, limit)));
+
+	const missing = engineResults.filter(result => result.status !== 'ok').map(result => result.engine);
+	if (missing.length > 0) {
+		res.set('X-Search-Missing-Engines', missing.join(','));
+	}
+    res.json(mergeEngineResults(q, engineResults));
   } catch (error) {
     console.error('Search error:', error);
+    if (res.headersSent) {
+      return res.end();
+    }
     res.status(500).json({ error: 'Internal server error' });
   }
 });
 
+// Search cache statistics
+app.get('/api/search/stats', (req, res) => {
+  res.json({ ...searchCache.stats(), recorder: priceRecorder.stats() });
+});
+
 // Watchlist routes
 app.get('/api/watchlist/:userId', async (req, res) => {
   try {
@@ -282,15 +347,7 @@ app.get('/api/watchlist/:userId', async (req, res) => {
         pd.timestamp as last_price_timestamp
       FROM watchlist w
       JOIN items i ON w.item_id = i.id
-      LEFT JOIN (
-        SELECT 
-          item_id,
-          price,
-          marketplace_id,
-          timestamp,
-          ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY timestamp DESC) as rn
-        FROM price_data
-      ) pd ON i.id = pd.item_id AND pd.rn = 1
+      LEFT JOIN item_latest_price pd ON pd.item_id = i.id
       WHERE w.user_id = ?
       ORDER BY w.created_at DESC
     `, [userId]);
@@ -371,37 +428,44 @@ app.get('/api/predictions/:productId', async (req, res) => {
 
 app.get('/api/products', async (req, res) => {
   try {
-    // Get all products with their latest price and prediction info
+    // Latest price and prediction info come precomputed from product_forecast_summary.
+    // Forecast points are relative to the day they were computed (forecast_as_of); on
+    // later days, or for products with no summary row yet, they are read from the
+    // active model's forecasts and the latest price_history row instead.
     const [products] = await pool.execute(`
       SELECT 
         p.id,
         p.sku,
         p.title,
-        ph.price as current_price,
-        ph.ds as last_price_date,
-        f.yhat as next_predicted_price,
-        f.ds as next_prediction_date,
-        mm.model_version,
-        mm.performance_metrics
+        IF(s.product_id IS NULL, lp.price, s.last_price) as current_price,
+        IF(s.product_id IS NULL, lp.ds, s.last_price_date) as last_price_date,
+        IF(s.forecast_as_of = CURDATE(), s.next_predicted_price, nxt.yhat) as next_predicted_price,
+        IF(s.forecast_as_of = CURDATE(), s.next_prediction_date, nxt.ds) as next_prediction_date,
+        IF(s.forecast_as_of = CURDATE(), s.forecast_7d, f7.yhat) as forecast_7d,
+        IF(s.forecast_as_of = CURDATE(), s.forecast_30d, f30.yhat) as forecast_30d,
+        COALESCE(s.model_version, mm.model_version) as model_version,
+        COALESCE(s.performance_metrics, mm.performance_metrics) as performance_metrics
       FROM products p
-      LEFT JOIN (
-        SELECT 
-          product_id,
-          price,
-          ds,
-          ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY ds DESC) as rn
-        FROM price_history
-      ) ph ON p.id = ph.product_id AND ph.rn = 1
-      LEFT JOIN (
-        SELECT 
-          product_id,
-          yhat,
-          ds,
-          ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY ds ASC) as rn
-        FROM forecasts
-        WHERE ds >= CURDATE()
-      ) f ON p.id = f.product_id AND f.rn = 1
-      LEFT JOIN model_metadata mm ON p.id = mm.product_id AND mm.is_active = 1
+      LEFT JOIN product_forecast_summary s ON s.product_id = p.id
+      LEFT JOIN model_metadata mm
+        ON NOT (s.forecast_as_of <=> CURDATE())
+        AND mm.product_id = p.id AND mm.is_active = 1
+      LEFT JOIN price_history lp
+        ON s.product_id IS NULL
+        AND lp.product_id = p.id
+        AND lp.ds = (SELECT MAX(ph.ds) FROM price_history ph WHERE ph.product_id = p.id)
+      LEFT JOIN forecasts nxt
+        ON nxt.product_id = p.id AND nxt.model_version = mm.model_version
+        AND nxt.ds = (
+          SELECT MIN(f.ds) FROM forecasts f
+          WHERE f.product_id = p.id AND f.model_version = mm.model_version AND f.ds >= CURDATE()
+        )
+      LEFT JOIN forecasts f7
+        ON f7.product_id = p.id AND f7.model_version = mm.model_version
+        AND f7.ds = CURDATE() + INTERVAL 7 DAY
+      LEFT JOIN forecasts f30
+        ON f30.product_id = p.id AND f30.model_version = mm.model_version
+        AND f30.ds = CURDATE() + INTERVAL 30 DAY
       ORDER BY p.created_at DESC
     `);
     
@@ -580,14 +644,7 @@ app.get('/api/watchlist', authenticateToken, async (req, res) => {
         pd.timestamp as last_price_timestamp
       FROM watchlist w
       INNER JOIN items i ON w.item_id = i.id
-      LEFT JOIN (
-        SELECT 
-          item_id,
-          price,
-          timestamp,
-          ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY timestamp DESC) as rn
-        FROM price_data
-      ) pd ON i.id = pd.item_id AND pd.rn = 1
+      LEFT JOIN item_latest_price pd ON pd.item_id = i.id
       WHERE w.user_id = ?
       ORDER BY w.created_at DESC
     `, [userId]);
@@ -608,21 +665,24 @@ app.post('/api/watchlist', authenticateToken, async (req, res) => {
     
     // If itemData is provided, create item first (for search results)
     if (itemData && !itemId) {
-      // Check if item already exists by name and source
+      // Check if item already exists by name (search results are recorded by normalized name)
+      const normalizedName = normalizeItemName(itemData.name);
       const [existingItems] = await pool.execute(
-        'SELECT id FROM items WHERE name = ? LIMIT 1',
-        [itemData.name]
+        'SELECT id FROM items WHERE normalized_name = ? OR name = ? LIMIT 1',
+        [normalizedName, itemData.name]
       );
       
       if (existingItems.length > 0) {
         finalItemId = existingItems[0].id;
       } else {
-        // Create new item
+        // Create new item; the price recorder may have inserted it since the lookup
         const [result] = await pool.execute(
-          `INSERT INTO items (name, description, category, brand, model, image_url, created_at) 
-           VALUES (?, ?, ?, ?, ?, ?, NOW())`,
+          `INSERT INTO items (name, normalized_name, description, category, brand, model, image_url, created_at) 
+           VALUES (?, ?, ?, ?, ?, ?, ?, NOW())
+           ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)`,
           [
             itemData.name || 'Unknown Item',
+            normalizedName || null,
             itemData.description || null,
             itemData.category || null,
             itemData.brand || null,
@@ -0,0 +1,170 @@
+// Records prices seen in search results into price_data, off the request path.
+//
+// Observations are queued in memory and written in batches: items are upserted
+// by normalized name, marketplaces are resolved through an in-memory cache, and
+// prices go in with one multi-row INSERT IGNORE per batch (the unique
+// item/marketplace/timestamp key drops repeats within the same second).
+//
+// Item and marketplace names are matched with the columns' collation, which
+// ignores case and accents, so the stored spelling can differ from ours. IDs are
+// therefore always keyed by the strings we sent, never by what MySQL returns.
+
+export function normalizeItemName(name) {
+	return String(name || "").trim().toLowerCase().replace(/\s+/g, " ").slice(0, 500);
+}
+
+function baseUrl(link) {
+	try {
+		return new URL(link).origin;
+	} catch (e) {
+		return "";
+	}
+}
+
+export function createPriceRecorder(pool, options = {}) {
+	const {
+		batchSize = 200,
+		flushIntervalMs = 2000,
+		maxQueue = 5000
+	} = options;
+
+	let queue = [];
+	let flushing = null;
+	let timer = null;
+	const marketplaceIds = new Map(); // marketplace name -> id
+	const counters = {
+		queued: 0,
+		dropped: 0,
+		written: 0,
+		batches: 0,
+		failedBatches: 0
+	};
+
+	// Queue cleaned search results ({name, source, price, product_link, thumbnail}); never blocks
+	function record(results) {
+		const observedAt = new Date();
+		for (const item of results) {
+			if (typeof item.price !== "number" || !item.name || !item.source) continue;
+			if (queue.length >= maxQueue) {
+				counters.dropped++;
+				continue;
+			}
+			queue.push({
+				...item,
+				normalizedName: normalizeItemName(item.name),
+				marketplace: String(item.source).slice(0, 100),
+				observedAt
+			});
+			counters.queued++;
+		}
+		if (queue.length >= batchSize) {
+			flush().catch(() => {});
+		}
+	}
+
+	// IDs of `table` rows whose `column` equals each input, keyed by the input string.
+	// Each input is compared as a bound literal, so the column's collation applies
+	// exactly as in a plain WHERE, and the input is returned next to its match.
+	async function idsByInput(table, column, inputs) {
+		const lookups = inputs
+			.map(() => `SELECT ? AS input, (SELECT id FROM ${table} WHERE ${column} = ? LIMIT 1) AS id`)
+			.join(' UNION ALL ');
+		const [rows] = await pool.query(lookups, inputs.flatMap(input => [input, input]));
+		return new Map(rows.filter(row => row.id != null).map(row => [row.input, row.id]));
+	}
+
+	async function resolveMarketplaces(observations) {
+		const links = new Map();
+		for (const o of observations) {
+			if (!marketplaceIds.has(o.marketplace) && !links.has(o.marketplace)) {
+				links.set(o.marketplace, baseUrl(o.product_link));
+			}
+		}
+		if (links.size === 0) return;
+
+		const names = [...links.keys()];
+		await pool.query(
+			'INSERT IGNORE INTO marketplaces (name, base_url) VALUES ?',
+			[names.map(name => [name, links.get(name).slice(0, 500)])]
+		);
+		for (const [name, id] of await idsByInput('marketplaces', 'name', names)) {
+			marketplaceIds.set(name, id);
+		}
+	}
+
+	async function upsertItems(observations) {
+		const items = new Map();
+		for (const o of observations) {
+			if (!items.has(o.normalizedName)) items.set(o.normalizedName, o);
+		}
+
+		const names = [...items.keys()];
+		await pool.query(
+			`INSERT INTO items (name, normalized_name, image_url) VALUES ?
+			 ON DUPLICATE KEY UPDATE image_url = COALESCE(items.image_url, VALUES(image_url))`,
+			[names.map(name => [items.get(name).name.slice(0, 500), name, items.get(name).thumbnail || null])]
+		);
+		return idsByInput('items', 'normalized_name', names);
+	}
+
+	async function writeBatch(observations) {
+		await resolveMarketplaces(observations);
+		const itemIds = await upsertItems(observations);
+
+		const rows = [];
+		for (const o of observations) {
+			const itemId = itemIds.get(o.normalizedName);
+			const marketplaceId = marketplaceIds.get(o.marketplace);
+			if (!itemId || !marketplaceId) continue;
+			rows.push([itemId, marketplaceId, o.price, 'USD', o.product_link || null, o.observedAt]);
+		}
+		if (rows.length === 0) return 0;
+
+		const [result] = await pool.query(
+			'INSERT IGNORE INTO price_data (item_id, marketplace_id, price, currency, url, timestamp) VALUES ?',
+			[rows]
+		);
+		return result.affectedRows;
+	}
+
+	// Write everything queued so far, one batch at a time
+	async function flush() {
+		if (flushing) return flushing;
+		flushing = (async () => {
+			while (queue.length > 0) {
+				const batch = queue.slice(0, batchSize);
+				queue = queue.slice(batchSize);
+				try {
+					counters.written += await writeBatch(batch);
+					counters.batches++;
+				} catch (error) {
+					counters.failedBatches++;
+					console.error('Price recorder error:', error.message);
+				}
+			}
+		})().finally(() => { flushing = null; });
+		return flushing;
+	}
+
+	function start() {
+		if (timer) return;
+		timer = setInterval(() => { flush().catch(() => {}); }, flushIntervalMs);
+		timer.unref();
+	}
+
+	async function stop() {
+		clearInterval(timer);
+		timer = null;
+		await flush();
+	}
+
+	function stats() {
+		return {
+			...counters,
+			pending: queue.length,
+			marketplacesCached: marketplaceIds.size
+		};
+	}
+
+	return { record, flush, start, stop, stats };
+}
@@ -0,0 +1,110 @@
+// Per-engine cache of raw SerpAPI responses for /api/search.
+//
+// Entries are keyed by engine + normalized query and are fresh for `ttlMs`.
+// For a further `staleMs` a stale entry is still served while one background
+// request refreshes it. Identical lookups that arrive while a request is in
+// flight share that request (single flight), and the least recently used
+// entries are evicted once `maxEntries` is reached.
+
+export function normalizeQuery(query) {
+	return String(query || "").trim().toLowerCase().replace(/\s+/g, " ");
+}
+
+export function createSearchCache(fetcher, options = {}) {
+	const {
+		ttlMs = 10 * 60 * 1000,
+		staleMs = 50 * 60 * 1000,
+		maxEntries = 500,
+		now = Date.now
+	} = options;
+
+	const entries = new Map(); // key -> { value, fetchedAt }, in LRU order
+	const inFlight = new Map(); // key -> Promise
+	const counters = {
+		hits: 0,
+		staleHits: 0,
+		misses: 0,
+		coalesced: 0,
+		refreshes: 0,
+		evictions: 0,
+		errors: 0
+	};
+
+	function store(key, value) {
+		entries.delete(key);
+		entries.set(key, { value, fetchedAt: now() });
+		while (entries.size > maxEntries) {
+			entries.delete(entries.keys().next().value);
+			counters.evictions++;
+		}
+	}
+
+	function load(key, params) {
+		const pending = inFlight.get(key);
+		if (pending) return pending;
+
+		const request = new Promise(resolve => resolve(fetcher(params)))
+			.then(value => {
+				store(key, value);
+				return value;
+			})
+			.catch(error => {
+				counters.errors++;
+				throw error;
+			})
+			.finally(() => inFlight.delete(key));
+		inFlight.set(key, request);
+		return request;
+	}
+
+	// Resolves to the engine's raw response for `query`; `params` are passed to the fetcher on a miss
+	async function get(engine, query, params) {
+		const key = `${engine}:${normalizeQuery(query)}`;
+		const entry = entries.get(key);
+		const age = entry ? now() - entry.fetchedAt : Infinity;
+
+		if (age <= ttlMs) {
+			counters.hits++;
+			entries.delete(key);
+			entries.set(key, entry);
+			return entry.value;
+		}
+
+		if (age <= ttlMs + staleMs) {
+			counters.staleHits++;
+			if (!inFlight.has(key)) {
+				counters.refreshes++;
+				// A failed refresh keeps serving the stale entry until it expires
+				load(key, params).catch(() => {});
+			}
+			return entry.value;
+		}
+
+		if (entry) entries.delete(key);
+		if (inFlight.has(key)) {
+			counters.coalesced++;
+		} else {
+			counters.misses++;
+		}
+		return load(key, params);
+	}
+
+	function stats() {
+		const lookups = counters.hits + counters.staleHits + counters.misses + counters.coalesced;
+		return {
+			...counters,
+			size: entries.size,
+			inFlight: inFlight.size,
+			maxEntries,
+			ttlMs,
+			staleMs,
+			hitRate: lookups ? (counters.hits + counters.staleHits) / lookups : 0
+		};
+	}
+
+	function clear() {
+		entries.clear();
+	}
+
+	return { get, stats, clear };
+}
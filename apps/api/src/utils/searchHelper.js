@@ -55,4 +55,21 @@ export function searchFilter(query, products, priceFilter) {
 	if (median < 50) return nameFiltered;
 
 	return nameFiltered.filter(i => i.price >= median * 0.25 && i.price <= median * 3.0);
-}
\ No newline at end of file
+}
+
+export function sortByPrice(products) {
+	return products.sort((a,b) => {
+		if (a.price == null) return 1;
+		if (b.price == null) return -1;
+		return a.price - b.price;
+	});
+}
+
+// Resolves to `fallback` if `promise` has not settled within `ms`; the promise itself keeps running
+export function withDeadline(promise, ms, fallback) {
+	let timer;
+	const deadline = new Promise(resolve => {
+		timer = setTimeout(() => resolve(fallback), ms);
+	});
+	return Promise.race([promise, deadline]).finally(() => clearTimeout(timer));
+}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+PriceScout Forecast Formats
+Content negotiation, columnar/binary encodings and compression for forecast responses
+"""
+
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Output formats and the media types they are served as
+FORMAT_MIME_TYPES = {
+    'json': 'application/json',
+    'columns': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Accept header candidates, JSON first so */* keeps the existing row-object shape
+_ACCEPT_CANDIDATES = [
+    ('application/json', 'json'),
+    ('application/x-ndjson', 'ndjson'),
+    ('application/msgpack', 'msgpack'),
+    ('application/x-msgpack', 'msgpack'),
+    ('application/vnd.apache.arrow.stream', 'arrow'),
+]
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+class UnsupportedFormat(Exception):
+    """Requested encoding is unknown or its optional library is not installed."""
+
+
+def negotiate_format(requested: Optional[str], accept_mimetypes) -> str:
+    """
+    Pick the response format from an explicit ``format`` parameter or the Accept header.
+
+    Args:
+        requested: Value of the ``format`` query parameter, if any
+        accept_mimetypes: werkzeug MIMEAccept for the request
+
+    Returns:
+        One of the keys of FORMAT_MIME_TYPES
+    """
+    if requested:
+        if requested not in FORMAT_MIME_TYPES:
+            raise UnsupportedFormat(f"format must be one of {', '.join(FORMAT_MIME_TYPES)}")
+        return requested
+
+    best = accept_mimetypes.best_match([mime for mime, _ in _ACCEPT_CANDIDATES], default='application/json')
+    return dict(_ACCEPT_CANDIDATES)[best]
+
+
+def forecast_columns(rows: Iterable[Any], with_product_id: bool = False) -> Dict[str, List[Any]]:
+    """Transpose forecast rows (ds, yhat, yhat_lower, yhat_upper[, product_id]) into column lists."""
+    columns: Dict[str, List[Any]] = {
+        'date': [],
+        'predicted_price': [],
+        'lower_bound': [],
+        'upper_bound': [],
+    }
+    if with_product_id:
+        columns = {'product_id': [], **columns}
+
+    for row in rows:
+        if with_product_id:
+            columns['product_id'].append(row.product_id)
+        columns['date'].append(row.ds)
+        columns['predicted_price'].append(float(row.yhat))
+        columns['lower_bound'].append(float(row.yhat_lower))
+        columns['upper_bound'].append(float(row.yhat_upper))
+    return columns
+
+
+def jsonable_columns(columns: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """Columns with dates rendered as ISO strings."""
+    return {**columns, 'date': [str(value) for value in columns['date']]}
+
+
+def encode_msgpack(payload: Dict[str, Any]) -> bytes:
+    """Encode a columnar payload as MessagePack (dates must already be strings)."""
+    try:
+        import msgpack
+    except ImportError as e:
+        raise UnsupportedFormat("MessagePack responses require the 'msgpack' package") from e
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_arrow(columns: Dict[str, List[Any]], metadata: Dict[str, str]) -> bytes:
+    """Encode forecast columns as an Arrow IPC stream with typed date/float columns."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise UnsupportedFormat("Arrow responses require the 'pyarrow' package") from e
+
+    arrays = {}
+    if 'product_id' in columns:
+        arrays['product_id'] = pa.array(columns['product_id'], type=pa.int32())
+    arrays['date'] = pa.array(columns['date'], type=pa.date32())
+    for name in ('predicted_price', 'lower_bound', 'upper_bound'):
+        arrays[name] = pa.array(columns[name], type=pa.float64())
+
+    table = pa.table(arrays).replace_schema_metadata({key: str(value) for key, value in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ndjson_line(record: Dict[str, Any]) -> str:
+    return json.dumps(record, default=str) + '\n'
+
+
+def _compressors() -> List[str]:
+    try:
+        import brotli  # noqa: F401
+        return ['br', 'gzip']
+    except ImportError:
+        return ['gzip']
+
+
+def compress_body(body: bytes, accept_encodings) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a response body with the best encoding the client accepts.
+
+    Returns:
+        (body, content encoding) - the encoding is None when left uncompressed
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+
+    encoding = accept_encodings.best_match(_compressors())
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=5), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+def compress_response(response, accept_encodings):
+    """Flask after_request helper: compress buffered 200 responses in place."""
+    if response.status_code != 200 or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+
+    body, encoding = compress_body(response.get_data(), accept_encodings)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+PriceScout Data Cleaning
+Vectorized validation of sku/ds/y price frames before they are loaded
+"""
+
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Largest value a DECIMAL(10,2) price column can hold
+MAX_PRICE = 99999999.99
+
+# Scales the median absolute deviation to a standard-deviation equivalent
+MAD_SCALE = 1.4826
+
+REJECT_REASONS = ('missing_sku', 'invalid_date', 'invalid_price', 'duplicate')
+
+
+def empty_reject_report() -> Dict[str, int]:
+    """Counters for every reject reason plus rows seen, kept and clipped."""
+    report = {reason: 0 for reason in REJECT_REASONS}
+    report.update({'rows_in': 0, 'rows_out': 0, 'clipped_outliers': 0})
+    return report
+
+
+def merge_reject_reports(total: Dict[str, int], report: Dict[str, int]) -> Dict[str, int]:
+    """Add one chunk's counters into a running total."""
+    for key, value in report.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def clean_price_frame(
+    df: pd.DataFrame,
+    date_format: str = '%Y-%m-%d',
+    outlier_z: float = 0.0
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Validate and clean a sku/ds/y frame.
+
+    Rows without a SKU, with an unparseable date, or with a missing, non-positive
+    or out-of-range price are dropped. Duplicate (sku, ds) rows keep the last
+    occurrence. With ``outlier_z`` > 0, prices further than that many robust
+    z-scores (median/MAD per SKU) from the SKU median are clipped to the bound.
+
+    Args:
+        df: Frame with sku, ds and y columns
+        date_format: strftime format used to coerce string dates
+        outlier_z: Robust z-score clip threshold (0 disables clipping)
+
+    Returns:
+        (cleaned frame, reject report)
+    """
+    report = empty_reject_report()
+    report['rows_in'] = len(df)
+
+    sku = df['sku']
+    ds = df['ds']
+    if not pd.api.types.is_datetime64_any_dtype(ds):
+        ds = pd.to_datetime(ds, format=date_format, errors='coerce')
+    y = pd.to_numeric(df['y'], errors='coerce')
+
+    missing_sku = sku.isna().to_numpy()
+    if not isinstance(sku.dtype, pd.CategoricalDtype):
+        missing_sku |= (sku.astype(str).str.strip() == '').to_numpy()
+    invalid_date = ds.isna().to_numpy() & ~missing_sku
+    y_values = y.to_numpy(dtype='float64')
+    bad_price = ~np.isfinite(y_values) | (y_values <= 0) | (y_values > MAX_PRICE)
+    invalid_price = bad_price & ~missing_sku & ~invalid_date
+
+    report['missing_sku'] = int(missing_sku.sum())
+    report['invalid_date'] = int(invalid_date.sum())
+    report['invalid_price'] = int(invalid_price.sum())
+
+    keep = ~(missing_sku | invalid_date | invalid_price)
+    cleaned = pd.DataFrame({'sku': sku[keep], 'ds': ds[keep], 'y': y[keep].astype('float64')})
+
+    duplicate = cleaned.duplicated(subset=['sku', 'ds'], keep='last')
+    report['duplicate'] = int(duplicate.sum())
+    if report['duplicate']:
+        cleaned = cleaned[~duplicate.to_numpy()]
+
+    if outlier_z > 0 and not cleaned.empty:
+        cleaned, report['clipped_outliers'] = _clip_outliers(cleaned, outlier_z)
+
+    report['rows_out'] = len(cleaned)
+    rejected = report['rows_in'] - report['rows_out']
+    if rejected:
+        logger.info(f"Cleaning rejected {rejected} of {report['rows_in']} rows: "
+                    + ", ".join(f"{reason}={report[reason]}" for reason in REJECT_REASONS if report[reason]))
+
+    return cleaned, report
+
+
+def _clip_outliers(df: pd.DataFrame, outlier_z: float) -> Tuple[pd.DataFrame, int]:
+    """Clip prices to median +/- outlier_z * scaled MAD within each SKU."""
+    grouped = df.groupby('sku', observed=True, sort=False)['y']
+    median = grouped.transform('median')
+    mad = (df['y'] - median).abs().groupby(df['sku'], observed=True, sort=False).transform('median') * MAD_SCALE
+
+    # A zero MAD (flat series) would clip every change, so those SKUs are left alone
+    spread = (mad * outlier_z).where(mad > 0, np.inf)
+    lower, upper = median - spread, median + spread
+    clipped = df['y'].clip(lower=lower, upper=upper)
+
+    n_clipped = int((clipped != df['y']).sum())
+    if n_clipped:
+        df = df.assign(y=clipped)
+    return df, n_clipped
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+PriceScout Distributed Training
+Lease-based work queue in MySQL so training workers on any number of nodes can share one run
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from pydantic_settings import BaseSettings
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class DistributedConfig(BaseSettings):
+    batch_size: int = 50  # products per lease
+    lease_seconds: int = 900
+    max_attempts: int = 3  # claims per batch before it is reported as failed
+
+
+class Lease(NamedTuple):
+    run_id: str
+    batch_index: int
+    units: List[Dict[str, Any]]  # [{"group": key or None, "product_ids": [...]}]
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseQueue:
+    """
+    Batches of a training run in ``training_leases``, claimed with SELECT ... FOR UPDATE SKIP LOCKED.
+
+    A claim marks a batch leased to one worker until ``lease_expires_at``. Workers
+    renew the lease while they train and record the batch outcome when done. A
+    lease that expires (worker died or stalled) is claimable again, up to
+    ``max_attempts`` claims. Completion only counts for the worker that currently
+    holds the lease, so a late finisher never overwrites a reclaimed batch.
+    """
+
+    def __init__(self, engine: Engine, config: DistributedConfig):
+        self.engine = engine
+        self.config = config
+
+    def enqueue(self, run_id: str, batches: List[List[Dict[str, Any]]], priorities: Optional[List[int]] = None) -> int:
+        """Insert one pending lease per batch of fit units; returns the number of batches."""
+        priorities = priorities or [0] * len(batches)
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO training_leases (run_id, batch_index, units, product_count, priority, status)
+                VALUES (:run_id, :batch_index, :units, :product_count, :priority, 'pending')
+            """), [
+                {
+                    "run_id": run_id,
+                    "batch_index": index,
+                    "units": json.dumps(units),
+                    "product_count": sum(len(unit['product_ids']) for unit in units),
+                    "priority": priority
+                }
+                for index, (units, priority) in enumerate(zip(batches, priorities))
+            ])
+        return len(batches)
+
+    def claim(self, run_id: str, worker_id: str) -> Optional[Lease]:
+        """Lease the next pending or expired batch of a run, or None when nothing is claimable."""
+        with self.engine.begin() as conn:
+            row = conn.execute(text("""
+                SELECT batch_index, units, attempts
+                FROM training_leases
+                WHERE run_id = :run_id
+                  AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < NOW()))
+                  AND attempts < :max_attempts
+                ORDER BY priority DESC, batch_index
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """), {"run_id": run_id, "max_attempts": self.config.max_attempts}).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(text("""
+                UPDATE training_leases
+                SET status = 'leased',
+                    worker_id = :worker_id,
+                    attempts = attempts + 1,
+                    lease_expires_at = NOW() + INTERVAL :lease_seconds SECOND
+                WHERE run_id = :run_id AND batch_index = :batch_index
+            """), {
+                "run_id": run_id,
+                "batch_index": row.batch_index,
+                "worker_id": worker_id,
+                "lease_seconds": self.config.lease_seconds
+            })
+
+        units = json.loads(row.units) if isinstance(row.units, (str, bytes)) else row.units
+        return Lease(run_id, row.batch_index, units, row.attempts + 1)
+
+    def renew(self, lease: Lease, worker_id: str) -> bool:
+        """Extend a held lease; False if it expired and was claimed by another worker."""
+        with self.engine.begin() as conn:
+            result = conn.execute(text("""
+                UPDATE training_leases
+                SET lease_expires_at = NOW() + INTERVAL :lease_seconds SECOND
+                WHERE run_id = :run_id AND batch_index = :batch_index
+                  AND worker_id = :worker_id AND status = 'leased'
+            """), {
+                "run_id": lease.run_id,
+                "batch_index": lease.batch_index,
+                "worker_id": worker_id,
+                "lease_seconds": self.config.lease_seconds
+            })
+            return result.rowcount > 0
+
+    def complete(self, lease: Lease, worker_id: str, results: Dict[str, Any]) -> bool:
+        """Record a batch outcome; False if the lease was lost in the meantime."""
+        with self.engine.begin() as conn:
+            result = conn.execute(text("""
+                UPDATE training_leases
+                SET status = :status,
+                    successful = :successful,
+                    failed = :failed,
+                    errors = :errors,
+                    lease_expires_at = NULL
+                WHERE run_id = :run_id AND batch_index = :batch_index
+                  AND worker_id = :worker_id AND status = 'leased'
+            """), {
+                "run_id": lease.run_id,
+                "batch_index": lease.batch_index,
+                "worker_id": worker_id,
+                "status": 'done' if results['failed'] == 0 else 'failed',
+                "successful": results['successful'],
+                "failed": results['failed'],
+                "errors": json.dumps(results['errors'])
+            })
+            return result.rowcount > 0
+
+    def outstanding(self, run_id: str) -> int:
+        """Batches of a run that are pending or may still be trained (held or reclaimable)."""
+        with self.engine.connect() as conn:
+            return int(conn.execute(text("""
+                SELECT COUNT(*)
+                FROM training_leases
+                WHERE run_id = :run_id
+                  AND (status = 'pending'
+                       OR (status = 'leased' AND NOT (lease_expires_at < NOW() AND attempts >= :max_attempts)))
+            """), {"run_id": run_id, "max_attempts": self.config.max_attempts}).scalar() or 0)
+
+    def report(self, run_id: str) -> Dict[str, Any]:
+        """Aggregate every batch of a run into one report."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT batch_index, status, worker_id, attempts, product_count,
+                       successful, failed, errors, lease_expires_at < NOW() as expired
+                FROM training_leases
+                WHERE run_id = :run_id
+                ORDER BY batch_index
+            """), {"run_id": run_id}).fetchall()
+
+        report = {
+            'run_id': run_id,
+            'batches': len(rows),
+            'total_products': 0,
+            'successful': 0,
+            'failed': 0,
+            'pending': 0,
+            'leased': 0,
+            'expired_leases': 0,
+            'abandoned_batches': 0,
+            'workers': [],
+            'errors': []
+        }
+        workers = set()
+        for row in rows:
+            report['total_products'] += row.product_count
+            report['successful'] += row.successful or 0
+            report['failed'] += row.failed or 0
+            if row.worker_id:
+                workers.add(row.worker_id)
+            if row.errors:
+                errors = json.loads(row.errors) if isinstance(row.errors, (str, bytes)) else row.errors
+                report['errors'].extend(errors)
+
+            if row.status == 'pending':
+                report['pending'] += 1
+            elif row.status == 'leased':
+                report['leased'] += 1
+                if row.expired:
+                    report['expired_leases'] += 1
+                    if row.attempts >= self.config.max_attempts:
+                        # Nobody will claim it again
+                        report['abandoned_batches'] += 1
+
+        report['workers'] = sorted(workers)
+        report['complete'] = report['pending'] == 0 and report['leased'] == report['abandoned_batches']
+        return report
+
+
+class LeaseHeartbeat:
+    """Renews a lease in the background while its batch trains."""
+
+    def __init__(self, queue: LeaseQueue, lease: Lease, worker_id: str):
+        self.queue = queue
+        self.lease = lease
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        interval = max(1.0, self.queue.config.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.renew(self.lease, self.worker_id):
+                    logger.warning(f"Lost lease on batch {self.lease.batch_index} of {self.lease.run_id}")
+                    self.lost = True
+                    return
+            except Exception as e:
+                logger.warning(f"Error renewing lease on batch {self.lease.batch_index}: {e}")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+PriceScout Forecast Summary
+Keeps product_forecast_summary (one row per product) in step with price and forecast writes
+"""
+
+import logging
+from typing import List
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_PRICE_SUMMARY_SQL = text("""
+    INSERT INTO product_forecast_summary (product_id, last_price, last_price_date)
+    SELECT ph.product_id, ph.price, ph.ds
+    FROM price_history ph
+    JOIN (
+        SELECT product_id, MAX(ds) as ds
+        FROM price_history
+        WHERE product_id IN :product_ids
+        GROUP BY product_id
+    ) latest ON latest.product_id = ph.product_id AND latest.ds = ph.ds
+    ON DUPLICATE KEY UPDATE
+        last_price = VALUES(last_price),
+        last_price_date = VALUES(last_price_date)
+""").bindparams(bindparam("product_ids", expanding=True))
+
+# Next = first forecast day from today; 7d/30d = the forecast for today + 7/30 days.
+# forecast_as_of records that "today", so readers can tell when these points are stale
+_FORECAST_SUMMARY_SQL = text("""
+    INSERT INTO product_forecast_summary (
+        product_id, model_version, performance_metrics,
+        next_prediction_date, next_predicted_price, forecast_7d, forecast_30d, forecast_as_of
+    )
+    SELECT
+        mm.product_id, mm.model_version, mm.performance_metrics,
+        nxt.ds, nxt.yhat, f7.yhat, f30.yhat, CURDATE()
+    FROM model_metadata mm
+    LEFT JOIN (
+        SELECT product_id, model_version, MIN(ds) as ds
+        FROM forecasts
+        WHERE product_id IN :product_ids AND ds >= CURDATE()
+        GROUP BY product_id, model_version
+    ) first_day ON first_day.product_id = mm.product_id AND first_day.model_version = mm.model_version
+    LEFT JOIN forecasts nxt
+        ON nxt.product_id = mm.product_id AND nxt.model_version = mm.model_version AND nxt.ds = first_day.ds
+    LEFT JOIN forecasts f7
+        ON f7.product_id = mm.product_id AND f7.model_version = mm.model_version
+        AND f7.ds = CURDATE() + INTERVAL 7 DAY
+    LEFT JOIN forecasts f30
+        ON f30.product_id = mm.product_id AND f30.model_version = mm.model_version
+        AND f30.ds = CURDATE() + INTERVAL 30 DAY
+    WHERE mm.product_id IN :product_ids AND mm.is_active = 1
+    ON DUPLICATE KEY UPDATE
+        model_version = VALUES(model_version),
+        performance_metrics = VALUES(performance_metrics),
+        next_prediction_date = VALUES(next_prediction_date),
+        next_predicted_price = VALUES(next_predicted_price),
+        forecast_7d = VALUES(forecast_7d),
+        forecast_30d = VALUES(forecast_30d),
+        forecast_as_of = VALUES(forecast_as_of)
+""").bindparams(bindparam("product_ids", expanding=True))
+
+
+def refresh_price_summary(conn, product_ids: List[int]) -> None:
+    """Update last price and date for the given products from price_history."""
+    if product_ids:
+        conn.execute(_PRICE_SUMMARY_SQL, {"product_ids": [int(pid) for pid in product_ids]})
+
+
+def refresh_forecast_summary(conn, product_ids: List[int]) -> None:
+    """Update forecast points and metrics for the given products from their active model."""
+    if product_ids:
+        conn.execute(_FORECAST_SUMMARY_SQL, {"product_ids": [int(pid) for pid in product_ids]})
+
+
+def rebuild_product_summaries(engine: Engine, batch_size: int = 500) -> int:
+    """
+    Recompute product_forecast_summary for every product, in product batches.
+
+    Run daily (``ingest_dataset.py --rebuild-summary``) to keep the forecast points
+    relative to the current date; until then /api/products reads rows whose
+    ``forecast_as_of`` is not today from forecasts directly.
+
+    Returns:
+        Number of products refreshed
+    """
+    with engine.connect() as conn:
+        product_ids = [row.id for row in conn.execute(text("SELECT id FROM products ORDER BY id"))]
+
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        with engine.begin() as conn:
+            refresh_price_summary(conn, batch)
+            refresh_forecast_summary(conn, batch)
+
+    logger.info(f"Rebuilt forecast summaries for {len(product_ids)} products")
+    return len(product_ids)
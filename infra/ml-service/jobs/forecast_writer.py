@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+PriceScout Forecast Writer
+Diff-only forecast upserts: rows are written in chunks, and chunks whose content hash is unchanged are skipped
+"""
+
+import hashlib
+import logging
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+FORECAST_COLUMNS = ['yhat', 'yhat_lower', 'yhat_upper']
+
+
+def chunk_hashes(forecast_data: pd.DataFrame, chunk_rows: int) -> List[str]:
+    """
+    Content hash per ``chunk_rows`` rows of a ds-sorted forecast frame.
+
+    Values are hashed as stored (dates as days, prices rounded to cents, as in the
+    DECIMAL(10,2) columns), so a refit that only moves values below a cent still
+    counts as unchanged.
+    """
+    days = forecast_data['ds'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    cents = np.round(forecast_data[FORECAST_COLUMNS].to_numpy(dtype='float64') * 100).astype(np.int64)
+
+    hashes = []
+    for start in range(0, len(forecast_data), chunk_rows):
+        digest = hashlib.sha1()
+        digest.update(days[start:start + chunk_rows].tobytes())
+        digest.update(cents[start:start + chunk_rows].tobytes())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def write_forecast_diff(
+    conn,
+    product_id: int,
+    model_version: str,
+    forecast_data: pd.DataFrame,
+    chunk_rows: int = 64
+) -> Tuple[int, int]:
+    """
+    Upsert a product's forecast rows for one model version, skipping unchanged chunks.
+
+    Runs inside the caller's transaction and issues no DDL, so every write here
+    commits or rolls back with the caller's other writes. Chunk hashes are stored
+    per (product, version, chunk) in ``forecast_chunk_hashes``; rows past the end
+    of a shorter rerun are deleted.
+
+    Returns:
+        (rows written, rows skipped)
+    """
+    if forecast_data.empty:
+        return 0, 0
+
+    forecast_data = forecast_data.sort_values('ds', kind='stable').reset_index(drop=True)
+    chunk_rows = max(1, chunk_rows)
+    hashes = chunk_hashes(forecast_data, chunk_rows)
+    key = {"product_id": product_id, "model_version": model_version}
+
+    stored = {
+        row.chunk_index: row.content_hash
+        for row in conn.execute(text("""
+            SELECT chunk_index, content_hash
+            FROM forecast_chunk_hashes
+            WHERE product_id = :product_id AND model_version = :model_version
+        """), key)
+    }
+    changed = [index for index, digest in enumerate(hashes) if stored.get(index) != digest]
+
+    # A shorter rerun can only end inside a changed last chunk or drop whole chunks
+    if stored and (max(stored) >= len(hashes) or len(hashes) - 1 in changed):
+        conn.execute(text("""
+            DELETE FROM forecasts
+            WHERE product_id = :product_id AND model_version = :model_version AND ds > :last_ds
+        """), {**key, "last_ds": forecast_data['ds'].iloc[-1].date()})
+        conn.execute(text("""
+            DELETE FROM forecast_chunk_hashes
+            WHERE product_id = :product_id AND model_version = :model_version AND chunk_index >= :n_chunks
+        """), {**key, "n_chunks": len(hashes)})
+
+    if not changed:
+        return 0, len(forecast_data)
+
+    positions = np.concatenate([np.arange(index * chunk_rows, min((index + 1) * chunk_rows, len(forecast_data)))
+                                for index in changed])
+    rows = forecast_data.iloc[positions]
+
+    # Rows are bound directly rather than staged: a shared staging table would be
+    # rewritten by concurrent writers, and its DDL would commit the caller's transaction
+    conn.execute(text("""
+        INSERT INTO forecasts(product_id, ds, yhat, yhat_lower, yhat_upper, model_version)
+        VALUES (:product_id, :ds, :yhat, :yhat_lower, :yhat_upper, :model_version)
+        ON DUPLICATE KEY UPDATE
+            yhat = VALUES(yhat),
+            yhat_lower = VALUES(yhat_lower),
+            yhat_upper = VALUES(yhat_upper)
+    """), [
+        {**key, "ds": ds.date(), "yhat": float(yhat), "yhat_lower": float(lower), "yhat_upper": float(upper)}
+        for ds, yhat, lower, upper in zip(
+            pd.to_datetime(rows['ds']), rows['yhat'], rows['yhat_lower'], rows['yhat_upper']
+        )
+    ])
+
+    conn.execute(text("""
+        INSERT INTO forecast_chunk_hashes(product_id, model_version, chunk_index, row_count, content_hash)
+        VALUES (:product_id, :model_version, :chunk_index, :row_count, :content_hash)
+        ON DUPLICATE KEY UPDATE
+            row_count = VALUES(row_count),
+            content_hash = VALUES(content_hash)
+    """), [
+        {
+            **key,
+            "chunk_index": index,
+            "row_count": min(chunk_rows, len(forecast_data) - index * chunk_rows),
+            "content_hash": hashes[index]
+        }
+        for index in changed
+    ])
+
+    return len(rows), len(forecast_data) - len(rows)
+
+
+def prune_chunk_hashes(conn, product_id: int, active_version: str) -> None:
+    """
+    Drop a product's chunk hashes for every version but the active one.
+
+    Hashes only serve reruns of the active version; forecast rows of older
+    versions are kept.
+    """
+    conn.execute(text("""
+        DELETE FROM forecast_chunk_hashes
+        WHERE product_id = :product_id AND model_version <> :model_version
+    """), {"product_id": product_id, "model_version": active_version})
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+PriceScout Grouped Training
+Fits seasonality once per product group and a lightweight level/trend per SKU
+"""
+
+import logging
+import re
+from statistics import NormalDist
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from jobs.stan_backend import make_prophet
+
+logger = logging.getLogger(__name__)
+
+# Multiplicative factors are floored here so deseasonalizing never divides by ~0
+MIN_SEASONAL_FACTOR = 1e-3
+
+
+def group_key(title: str, prefix_words: int = 2) -> str:
+    """
+    Group key for a product: the first ``prefix_words`` words of its title, lowercased.
+
+    Variants such as "Lunch Bag Red Retrospot" and "Lunch Bag Pink Polkadot" share
+    the key "lunch bag".
+    """
+    words = re.findall(r"[a-z0-9]+", (title or "").lower())
+    return " ".join(words[:prefix_words])
+
+
+class GroupSeasonality(NamedTuple):
+    """Seasonal terms of a group-level fit, indexed by date."""
+    multiplicative: pd.Series
+    additive: pd.Series
+
+
+def fit_group_seasonality(
+    histories: Dict[int, pd.DataFrame],
+    prophet_params: Dict[str, Any],
+    forecast_periods: int
+) -> GroupSeasonality:
+    """
+    Fit one Prophet model on the group's pooled, level-normalized history.
+
+    Each SKU is divided by its mean price so variants with different price points
+    contribute equally; the per-day mean of those ratios is the group index. The
+    model's seasonal terms are evaluated once, for every day any member needs.
+
+    Args:
+        histories: ds/y history per product in the group
+        prophet_params: Keyword arguments for Prophet
+        forecast_periods: Days forecast past each product's last observation
+
+    Returns:
+        Multiplicative and additive seasonal terms for every needed date
+    """
+    normalized = pd.concat(
+        [history[['ds']].assign(y=history['y'].to_numpy(dtype='float64') / history['y'].mean())
+         for history in histories.values()],
+        ignore_index=True
+    )
+    group_index = normalized.groupby('ds', sort=True)['y'].mean().reset_index()
+
+    model = make_prophet(**prophet_params)
+    model.fit(group_index)
+
+    # Every day from the first observation to the last forecast, so irregular histories are covered
+    last_ds = max(history['ds'].max() for history in histories.values())
+    dates = pd.date_range(normalized['ds'].min(), last_ds + pd.Timedelta(days=forecast_periods), freq='D')
+    terms = model.predict(pd.DataFrame({'ds': dates})).set_index('ds')
+    return GroupSeasonality(terms['multiplicative_terms'], terms['additive_terms'])
+
+
+def fit_sku_adjustment(
+    history: pd.DataFrame,
+    seasonality: GroupSeasonality,
+    forecast_periods: int,
+    validation_split: float = 0.2,
+    interval_width: float = 0.8
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Fit a linear level/trend for one SKU on top of its group's seasonality.
+
+    The SKU's prices are deseasonalized with the group terms, a least-squares line
+    is fitted against time, and the seasonality is re-applied to the line over the
+    history and ``forecast_periods`` future days. Intervals come from the spread of
+    the in-sample residuals.
+
+    Returns:
+        (forecast frame with ds/yhat/yhat_lower/yhat_upper, holdout metrics)
+    """
+    history = history.sort_values('ds')
+    level = float(history['y'].mean())
+    future_ds = pd.date_range(history['ds'].max() + pd.Timedelta(days=1), periods=forecast_periods, freq='D')
+    ds = pd.DatetimeIndex(history['ds']).append(future_ds)
+
+    origin = ds[0]
+    t = ((ds - origin) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+    factor = np.maximum(1.0 + seasonality.multiplicative.reindex(ds).fillna(0.0).to_numpy(), MIN_SEASONAL_FACTOR)
+    offset = seasonality.additive.reindex(ds).fillna(0.0).to_numpy() * level
+
+    n = len(history)
+    y = history['y'].to_numpy(dtype='float64')
+    deseasonalized = (y - offset[:n]) / factor[:n]
+
+    def fit_line(count: int) -> np.ndarray:
+        if count < 2:
+            return np.array([0.0, deseasonalized[:max(count, 1)].mean()])
+        return np.polyfit(t[:count], deseasonalized[:count], 1)
+
+    def project(coefficients: np.ndarray, positions: slice) -> np.ndarray:
+        return np.polyval(coefficients, t[positions]) * factor[positions] + offset[positions]
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+
+    # Holdout metrics: fit on the leading part, score the trailing validation_split
+    split = min(max(int(n * (1 - validation_split)), 2), n - 1)
+    holdout_line = fit_line(split)
+    train_fit = project(holdout_line, slice(0, split))
+    holdout_pred = project(holdout_line, slice(split, n))
+    metrics = _holdout_metrics(y[split:], holdout_pred, z * float(np.std(y[:split] - train_fit)))
+
+    coefficients = fit_line(n)
+    yhat = project(coefficients, slice(0, len(ds)))
+    spread = z * float(np.std(y - yhat[:n]))
+
+    forecast = pd.DataFrame({
+        'ds': ds,
+        'yhat': yhat,
+        'yhat_lower': yhat - spread,
+        'yhat_upper': yhat + spread
+    })
+    return forecast, metrics
+
+
+def _holdout_metrics(actual: np.ndarray, predicted: np.ndarray, spread: float) -> Dict[str, Any]:
+    """Same metric keys as the Prophet cross-validation summary."""
+    if len(actual) == 0:
+        return {}
+    error = predicted - actual
+    denominator = np.abs(actual) + np.abs(predicted)
+    return {
+        'mae': float(np.mean(np.abs(error))),
+        'mape': float(np.mean(np.abs(error) / np.abs(actual))),
+        'rmse': float(np.sqrt(np.mean(error ** 2))),
+        'smape': float(np.mean(np.where(denominator > 0, 2 * np.abs(error) / denominator, 0.0))),
+        'coverage': float(np.mean(np.abs(error) <= spread))
+    }
+
+
+def build_groups(
+    products: List[Dict[str, Any]],
+    prefix_words: int,
+    min_group_size: int
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Split products into groups of at least ``min_group_size`` and the remaining singles.
+
+    Returns:
+        (products per group key, products trained on their own)
+    """
+    by_key: Dict[str, List[Dict[str, Any]]] = {}
+    for product in products:
+        by_key.setdefault(group_key(product['title'] or product['sku'], prefix_words), []).append(product)
+
+    groups = {key: members for key, members in by_key.items() if key and len(members) >= min_group_size}
+    singles = [product for key, members in by_key.items() if key not in groups for product in members]
+    return groups, singles
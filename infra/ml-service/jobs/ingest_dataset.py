@@ -5,17 +5,26 @@ Pulls price data from S3 and loads it into RDS for Prophet training
 """
 
 import os
-import io
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable
 
 import boto3
+from botocore.config import Config as BotoConfig
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 from pydantic_settings import BaseSettings
 import toml
 
+from jobs.s3_reader import read_price_frame, iter_price_chunks, filter_dates, CSV_DTYPES, SUPPORTED_SUFFIXES
+from jobs.sku_resolver import get_resolver
+from jobs.cleaning import clean_price_frame, empty_reject_report, merge_reject_reports
+from jobs.forecast_summary import refresh_price_summary, rebuild_product_summaries
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,6 +46,21 @@ class AWSConfig(BaseSettings):
     s3_bucket: str
     access_key_id: str = ""
     secret_access_key: str = ""
+    endpoint_url: str = ""  # S3-compatible endpoint (MinIO, moto server); empty for AWS
+
+class IngestionConfig(BaseSettings):
+    max_concurrency: int = 16
+    write_batch_rows: int = 50000
+    date_format: str = "%Y-%m-%d"
+    sku_cache_size: int = 100000
+    write_shards: int = 1
+    shard_commit_rows: int = 5000
+    checkpoint_chunks: bool = False
+    chunk_rows: int = 500000
+    chunk_bytes: int = 64 * 1024 * 1024
+    outlier_z: float = 0.0
+    maintain_daily_series: bool = False
+    daily_fill_method: str = "ffill"  # "ffill" or "interpolate"
 
 class DataIngestionJob:
     def __init__(self, config_path: str = "config/settings.toml"):
@@ -44,21 +68,34 @@ class DataIngestionJob:
         self.config = self._load_config(config_path)
         self.db_config = DatabaseConfig(**self.config["database"])
         self.aws_config = AWSConfig(**self.config["aws"])
+        self.ingestion_config = IngestionConfig(**self.config.get("ingestion", {}))
+        
+        # Initialize database connection (one pooled connection per write shard)
+        shards = max(1, self.ingestion_config.write_shards)
+        self.engine = create_engine(self.db_config.url, pool_size=max(5, shards + 1))
+        self.last_load_report: Optional[Dict[str, Any]] = None
+        self.reject_report = empty_reject_report()
+        self._reject_lock = threading.Lock()
+        self.sku_resolver = get_resolver(self.db_config.url, self.ingestion_config.sku_cache_size)
         
-        # Initialize database connection
-        self.engine = create_engine(self.db_config.url)
+        # Initialize S3 client (sized so concurrent downloads don't queue on the connection pool)
+        client_kwargs = {
+            'region_name': self.aws_config.region,
+            'config': BotoConfig(max_pool_connections=max(10, self.ingestion_config.max_concurrency))
+        }
+        if self.aws_config.endpoint_url:
+            client_kwargs['endpoint_url'] = self.aws_config.endpoint_url
         
-        # Initialize S3 client
         if self.aws_config.access_key_id and self.aws_config.secret_access_key:
             self.s3_client = boto3.client(
                 's3',
-                region_name=self.aws_config.region,
                 aws_access_key_id=self.aws_config.access_key_id,
-                aws_secret_access_key=self.aws_config.secret_access_key
+                aws_secret_access_key=self.aws_config.secret_access_key,
+                **client_kwargs
             )
         else:
             # Use default credentials (IAM role, environment variables, etc.)
-            self.s3_client = boto3.client('s3', region_name=self.aws_config.region)
+            self.s3_client = boto3.client('s3', **client_kwargs)
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from TOML file."""
@@ -72,41 +109,295 @@ class DataIngestionJob:
             logger.error(f"Error loading configuration: {e}")
             raise
     
-    def ingest_from_s3(self, s3_key: str) -> bool:
+    def ingest_from_s3(
+        self,
+        s3_key: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> bool:
         """
-        Ingest price data from S3 CSV file.
+        Ingest price data from an S3 object.
+        
+        CSV objects may be gzip or zstd compressed; Parquet objects are read with
+        column projection and row-group pruning on the date range. With
+        ``ingestion.checkpoint_chunks`` the object is loaded chunk by chunk and a
+        failed run resumes after the last committed chunk.
         
         Args:
             s3_key: S3 object key (e.g., "curated/price_series/laptop_A.csv")
+            start_date: Optional first date to ingest (YYYY-MM-DD, inclusive)
+            end_date: Optional last date to ingest (YYYY-MM-DD, inclusive)
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
             logger.info(f"Starting ingestion from S3: s3://{self.aws_config.s3_bucket}/{s3_key}")
+            source = f"s3://{self.aws_config.s3_bucket}/{s3_key}"
             
-            # Download and parse CSV from S3
-            response = self.s3_client.get_object(
-                Bucket=self.aws_config.s3_bucket,
-                Key=s3_key
-            )
+            if self.ingestion_config.checkpoint_chunks:
+                return self._ingest_s3_checkpointed(s3_key, source, start_date, end_date)
             
-            df = pd.read_csv(io.BytesIO(response['Body'].read()))
+            df = self._read_s3_object(s3_key, start_date, end_date)
             logger.info(f"Loaded {len(df)} records from S3")
             
-            # Validate required columns
-            required_columns = ['sku', 'ds', 'y']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {missing_columns}")
-            
             # Process and load data
-            return self._process_and_load_data(df)
+            return self._process_and_load_data(df, source=source)
             
         except Exception as e:
             logger.error(f"Error ingesting from S3: {e}")
             return False
     
+    def _ingest_s3_checkpointed(
+        self,
+        s3_key: str,
+        source: str,
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ) -> bool:
+        """
+        Load an S3 object chunk by chunk, committing its resume offset with each chunk.
+        
+        The row/byte offset after a chunk is written to ``ingest_progress`` in the
+        same transaction as the chunk's rows, so a retry continues exactly after the
+        last chunk that reached the database.
+        """
+        row_offset, byte_offset = self._load_chunk_progress(source)
+        if row_offset:
+            logger.info(f"Resuming {source} after {row_offset} rows")
+        
+        start = pd.Timestamp(start_date).date() if start_date else None
+        end = pd.Timestamp(end_date).date() if end_date else None
+        
+        chunks = iter_price_chunks(
+            self.s3_client,
+            self.aws_config.s3_bucket,
+            s3_key,
+            row_offset=row_offset,
+            byte_offset=byte_offset,
+            chunk_rows=self.ingestion_config.chunk_rows,
+            chunk_bytes=self.ingestion_config.chunk_bytes,
+            date_format=self.ingestion_config.date_format
+        )
+        
+        loaded = 0
+        for chunk in chunks:
+            self._validate_columns(chunk.frame)
+            df = self._clean(filter_dates(chunk.frame, start, end))
+            
+            def checkpoint(conn, chunk=chunk) -> None:
+                self._save_progress(conn, source, 'chunk', chunk.row_offset, 'running', chunk.byte_offset)
+            
+            if not self._process_and_load_data(df, on_commit=checkpoint):
+                logger.error(f"Chunk ending at row {chunk.row_offset} of {source} failed; re-run to resume")
+                return False
+            loaded += len(df)
+            logger.info(f"Committed {source} through row {chunk.row_offset}")
+        
+        with self.engine.begin() as conn:
+            self._save_progress(conn, source, 'chunk', 0, 'done')
+        
+        logger.info(f"Successfully ingested {loaded} price records from {source}")
+        return True
+    
+    def _load_chunk_progress(self, source: str):
+        """(row_offset, byte_offset) to resume a chunked load from; (0, None) when starting fresh."""
+        with self.engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT row_offset, byte_offset, status
+                FROM ingest_progress
+                WHERE source = :source AND part = 'chunk'
+            """), {"source": source}).fetchone()
+        
+        if row is None or row.status == 'done':
+            return 0, None
+        return int(row.row_offset), row.byte_offset
+    
+    def ingest_from_s3_objects(
+        self,
+        prefix: Optional[str] = None,
+        keys: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ingest many S3 objects, either everything under a prefix or an explicit manifest of keys.
+        
+        Objects are downloaded concurrently (bounded by ``ingestion.max_concurrency``),
+        parsed as they arrive and written to the database in batches of roughly
+        ``ingestion.write_batch_rows`` rows.
+        
+        Args:
+            prefix: S3 key prefix to list (e.g., "curated/price_series/")
+            keys: Explicit list of S3 object keys
+            
+        Returns:
+            Dict with file/record counts and the keys that failed
+        """
+        if keys is None:
+            if prefix is None:
+                raise ValueError("Either prefix or keys is required")
+            keys = self._list_s3_keys(prefix)
+        
+        logger.info(f"Starting ingestion of {len(keys)} objects from s3://{self.aws_config.s3_bucket}")
+        return asyncio.run(self._ingest_s3_objects_async(keys))
+    
+    def _list_s3_keys(self, prefix: str) -> List[str]:
+        """List data object keys under an S3 prefix."""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.aws_config.s3_bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].lower().endswith(SUPPORTED_SUFFIXES):
+                    keys.append(obj['Key'])
+        return keys
+    
+    async def _ingest_s3_objects_async(self, keys: List[str]) -> Dict[str, Any]:
+        """Download objects concurrently and funnel them into batched database writes."""
+        report = {
+            'total_files': len(keys),
+            'loaded_files': 0,
+            'total_records': 0,
+            'write_batches': 0,
+            'failed_keys': [],
+            'success': False
+        }
+        loop = asyncio.get_running_loop()
+        concurrency = max(1, self.ingestion_config.max_concurrency)
+        downloads = ThreadPoolExecutor(max_workers=concurrency)
+        # A single writer thread keeps DB writes ordered while downloads continue
+        writer = ThreadPoolExecutor(max_workers=1)
+        
+        pending_keys = asyncio.Queue()
+        for key in keys:
+            pending_keys.put_nowait(key)
+        # Bounded hand-off: once it is full, downloaders wait until frames are consumed
+        downloaded = asyncio.Queue(maxsize=concurrency)
+        
+        async def download_worker() -> None:
+            while True:
+                try:
+                    key = pending_keys.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    df = await loop.run_in_executor(downloads, self._read_s3_object, key)
+                except Exception as e:
+                    logger.error(f"Error downloading s3://{self.aws_config.s3_bucket}/{key}: {e}")
+                    df = None
+                await downloaded.put((key, df))
+        
+        async def flush(frames: List[pd.DataFrame]) -> bool:
+            batch = pd.concat(frames, ignore_index=True)
+            report['write_batches'] += 1
+            return await loop.run_in_executor(writer, self._process_and_load_data, batch)
+        
+        workers = [asyncio.ensure_future(download_worker()) for _ in range(min(concurrency, len(keys)))]
+        try:
+            buffer, buffer_keys, buffered_rows = [], [], 0
+            pending_write = None
+            
+            for _ in range(len(keys)):
+                key, df = await downloaded.get()
+                if df is None:
+                    report['failed_keys'].append(key)
+                    continue
+                
+                buffer.append(df)
+                buffer_keys.append(key)
+                buffered_rows += len(df)
+                
+                if buffered_rows >= self.ingestion_config.write_batch_rows:
+                    # At most one write in flight. While this waits, nothing drains
+                    # `downloaded`, so at most `concurrency` frames queue up and the
+                    # downloaders stop taking new keys
+                    if pending_write is not None:
+                        await self._settle_write(pending_write, report)
+                    pending_write = (asyncio.ensure_future(flush(buffer)), buffer_keys, buffered_rows)
+                    buffer, buffer_keys, buffered_rows = [], [], 0
+            
+            if pending_write is not None:
+                await self._settle_write(pending_write, report)
+            if buffer:
+                await self._settle_write((asyncio.ensure_future(flush(buffer)), buffer_keys, buffered_rows), report)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            downloads.shutdown(wait=False)
+            writer.shutdown(wait=True)
+        
+        report['success'] = not report['failed_keys']
+        logger.info(
+            f"S3 ingestion finished: {report['loaded_files']}/{report['total_files']} files, "
+            f"{report['total_records']} records in {report['write_batches']} batches"
+        )
+        return report
+    
+    @staticmethod
+    async def _settle_write(pending_write, report: Dict[str, Any]) -> None:
+        """Wait for a batched write and record its outcome in the report."""
+        future, keys, rows = pending_write
+        if await future:
+            report['loaded_files'] += len(keys)
+            report['total_records'] += rows
+        else:
+            report['failed_keys'].extend(keys)
+    
+    def _read_s3_object(
+        self,
+        s3_key: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Stream and parse a price series object from S3."""
+        df = read_price_frame(
+            self.s3_client,
+            self.aws_config.s3_bucket,
+            s3_key,
+            start_date=pd.Timestamp(start_date).date() if start_date else None,
+            end_date=pd.Timestamp(end_date).date() if end_date else None,
+            date_format=self.ingestion_config.date_format
+        )
+        self._validate_columns(df)
+        return self._clean(df)
+    
+    def _clean(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Run the cleaning stage on one file or chunk and add its rejects to ``reject_report``."""
+        cleaned, report = clean_price_frame(
+            df,
+            date_format=self.ingestion_config.date_format,
+            outlier_z=self.ingestion_config.outlier_z
+        )
+        with self._reject_lock:
+            merge_reject_reports(self.reject_report, report)
+        return self._normalize_dtypes(cleaned)
+    
+    def _normalize_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reduce a sku/ds/y frame to compact, vectorized dtypes.
+        
+        SKUs become categorical, dates stay datetime64 (parsed with the configured
+        format rather than inferred) and prices are float64 rounded to the
+        DECIMAL(10,2) precision of price_history.
+        """
+        sku = df['sku']
+        if not isinstance(sku.dtype, pd.CategoricalDtype):
+            sku = sku.astype(str).astype('category')
+        
+        ds = df['ds']
+        if not pd.api.types.is_datetime64_any_dtype(ds):
+            ds = pd.to_datetime(ds, format=self.ingestion_config.date_format)
+        
+        y = pd.to_numeric(df['y']).astype('float64').round(2)
+        
+        return pd.DataFrame({'sku': sku, 'ds': ds, 'y': y})
+    
+    @staticmethod
+    def _validate_columns(df: pd.DataFrame) -> None:
+        """Raise if the frame lacks the sku/ds/y columns."""
+        required_columns = ['sku', 'ds', 'y']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+    
     def ingest_from_local(self, file_path: str) -> bool:
         """
         Ingest price data from local CSV file.
@@ -120,75 +411,316 @@ class DataIngestionJob:
         try:
             logger.info(f"Starting ingestion from local file: {file_path}")
             
-            df = pd.read_csv(file_path)
+            df = pd.read_csv(file_path, dtype=CSV_DTYPES)
             logger.info(f"Loaded {len(df)} records from local file")
             
             # Validate required columns
-            required_columns = ['sku', 'ds', 'y']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {missing_columns}")
+            self._validate_columns(df)
+            df = self._clean(df)
             
             # Process and load data
-            return self._process_and_load_data(df)
+            return self._process_and_load_data(df, source=os.path.abspath(file_path))
             
         except Exception as e:
             logger.error(f"Error ingesting from local file: {e}")
             return False
     
-    def _process_and_load_data(self, df: pd.DataFrame) -> bool:
-        """Process and load data into the database."""
+    def _process_and_load_data(
+        self,
+        df: pd.DataFrame,
+        source: Optional[str] = None,
+        on_commit: Optional[Callable[[Any], None]] = None
+    ) -> bool:
+        """
+        Process and load data into the database.
+        
+        With ``ingestion.write_shards`` > 1 the rows are written by several
+        connections in parallel (see ``_write_partitioned``); ``source`` names the
+        input so a failed partitioned load can resume from its checkpoints.
+        ``on_commit`` runs with the connection inside the write transaction (after
+        all shards when partitioned), e.g. to record a chunk checkpoint.
+        """
         try:
+            # Batches concatenated from several files lose their shared categories
+            df = self._normalize_dtypes(df)
+            
+            # Step 1: Resolve product IDs for the SKUs in this batch only
+            logger.info("Resolving products...")
+            sku = df['sku'].cat.remove_unused_categories()
+            skus = [str(value) for value in sku.cat.categories]
+            mapping = self.sku_resolver.resolve(self.engine, skus)
+            
+            # Step 2: Prepare price history data (map category codes, not rows)
+            logger.info("Preparing price history data...")
+            ids_by_code = np.array([mapping[value] for value in skus], dtype=np.int64)
+            price_history_df = pd.DataFrame({
+                'product_id': ids_by_code[sku.cat.codes.to_numpy()],
+                'ds': df['ds'].to_numpy(),
+                'price': df['y'].to_numpy()
+            })
+            
+            if self.ingestion_config.write_shards > 1:
+                report = self._write_partitioned(price_history_df, source)
+                self.last_load_report = report
+                if report['success']:
+                    with self.engine.begin() as conn:
+                        refresh_price_summary(conn, ids_by_code.tolist())
+                        if on_commit:
+                            on_commit(conn)
+                    self._refresh_daily_series(price_history_df)
+                return report['success']
+            
             with self.engine.begin() as conn:
-                # Step 1: Upsert products
-                logger.info("Upserting products...")
-                products_df = df[['sku']].drop_duplicates()
-                products_df['title'] = products_df['sku']  # Use SKU as title for now
-                
-                # Create staging table
-                products_df.to_sql('products_staging', conn, if_exists='replace', index=False)
-                
-                # Upsert products
-                conn.execute(text("""
-                    INSERT INTO products(sku, title) 
-                    SELECT sku, title FROM products_staging
-                    ON DUPLICATE KEY UPDATE title = VALUES(title)
-                """))
-                
-                # Get product ID mapping
-                product_mapping = pd.read_sql(
-                    "SELECT id, sku FROM products", 
-                    conn
-                )
-                
-                # Step 2: Prepare price history data
-                logger.info("Preparing price history data...")
-                df_merged = df.merge(product_mapping, on='sku')
-                price_history_df = df_merged[['id', 'ds', 'y']].rename(columns={
-                    'id': 'product_id',
-                    'y': 'price'
-                })
-                
-                # Convert date column
-                price_history_df['ds'] = pd.to_datetime(price_history_df['ds']).dt.date
-                
-                # Step 3: Upsert price history
+                # Step 3: Upsert price history (ds stays datetime64 until the DB truncates it)
                 logger.info("Upserting price history...")
                 price_history_df.to_sql('price_history_staging', conn, if_exists='replace', index=False)
                 
                 conn.execute(text("""
                     INSERT INTO price_history(product_id, ds, price)
-                    SELECT product_id, ds, price FROM price_history_staging
+                    SELECT product_id, DATE(ds), price FROM price_history_staging
                     ON DUPLICATE KEY UPDATE price = VALUES(price)
                 """))
+                refresh_price_summary(conn, ids_by_code.tolist())
+                
+                if on_commit:
+                    on_commit(conn)
                 
                 logger.info(f"Successfully ingested {len(price_history_df)} price records")
-                return True
+            
+            self._refresh_daily_series(price_history_df)
+            return True
                 
         except Exception as e:
             logger.error(f"Error processing and loading data: {e}")
             return False
     
+    def _refresh_daily_series(self, price_history_df: pd.DataFrame) -> None:
+        """
+        Bring ``price_history_daily`` up to date for the products in a loaded batch.
+        
+        Only the span from each product's earliest new date onwards is rebuilt,
+        seeded with the last stored price before it so forward-fill and
+        interpolation carry across the boundary.
+        """
+        if not self.ingestion_config.maintain_daily_series or price_history_df.empty:
+            return
+        
+        from_dates = price_history_df.groupby('product_id', sort=False)['ds'].min().reset_index()
+        from_dates.columns = ['product_id', 'from_ds']
+        
+        try:
+            with self.engine.begin() as conn:
+                from_dates.to_sql('daily_refresh_staging', conn, if_exists='replace', index=False)
+                raw = pd.read_sql(text("""
+                    SELECT ph.product_id, ph.ds, ph.price
+                    FROM price_history ph
+                    JOIN (
+                        SELECT s.product_id, COALESCE(MAX(prev.ds), DATE(s.from_ds)) as seed_ds
+                        FROM daily_refresh_staging s
+                        LEFT JOIN price_history prev
+                            ON prev.product_id = s.product_id AND prev.ds < DATE(s.from_ds)
+                        GROUP BY s.product_id, s.from_ds
+                    ) seeds ON seeds.product_id = ph.product_id
+                    WHERE ph.ds >= seeds.seed_ds
+                    ORDER BY ph.product_id, ph.ds
+                """), conn, parse_dates=['ds'])
+                
+                daily = self._regularize_daily(raw)
+                daily.to_sql('price_history_daily_staging', conn, if_exists='replace', index=False)
+                conn.execute(text("""
+                    INSERT INTO price_history_daily(product_id, ds, price, is_filled)
+                    SELECT product_id, DATE(ds), price, is_filled FROM price_history_daily_staging
+                    ON DUPLICATE KEY UPDATE price = VALUES(price), is_filled = VALUES(is_filled)
+                """))
+            
+            logger.info(f"Refreshed {len(daily)} daily rows for {len(from_dates)} products")
+            
+        except Exception as e:
+            # The raw rows are already committed; a later load or --rebuild-daily repairs this
+            logger.error(f"Error refreshing daily price series: {e}")
+    
+    def _regularize_daily(self, raw: pd.DataFrame) -> pd.DataFrame:
+        """Resample raw (product_id, ds, price) rows to one row per product per day, filling gaps."""
+        if raw.empty:
+            return pd.DataFrame(columns=['product_id', 'ds', 'price', 'is_filled'])
+        
+        # Same-day rows are averaged; days without rows come out as NaN
+        daily = (
+            raw.set_index('ds')
+            .groupby('product_id', sort=False)['price']
+            .resample('D')
+            .mean()
+        )
+        is_filled = daily.isna()
+        
+        by_product = daily.groupby(level='product_id', sort=False)
+        if self.ingestion_config.daily_fill_method == 'interpolate':
+            daily = by_product.transform(lambda series: series.interpolate(method='linear'))
+        else:
+            daily = by_product.ffill()
+        
+        return pd.DataFrame({
+            'product_id': daily.index.get_level_values('product_id'),
+            'ds': daily.index.get_level_values('ds'),
+            'price': daily.round(2).to_numpy(),
+            'is_filled': is_filled.to_numpy()
+        })
+    
+    def rebuild_daily_series(self, batch_size: int = 500) -> bool:
+        """Rebuild ``price_history_daily`` from scratch for every product, in product batches."""
+        try:
+            with self.engine.connect() as conn:
+                bounds = pd.read_sql(text("""
+                    SELECT product_id, MIN(ds) as ds
+                    FROM price_history
+                    GROUP BY product_id
+                    ORDER BY product_id
+                """), conn, parse_dates=['ds'])
+            
+            for start in range(0, len(bounds), batch_size):
+                self._refresh_daily_series(bounds.iloc[start:start + batch_size])
+            
+            logger.info(f"Rebuilt daily price series for {len(bounds)} products")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding daily price series: {e}")
+            return False
+    
+    def _write_partitioned(self, price_history_df: pd.DataFrame, source: Optional[str]) -> Dict[str, Any]:
+        """
+        Write price history in product-hash shards over concurrent connections.
+        
+        Each shard commits every ``ingestion.shard_commit_rows`` rows, so locks on
+        price_history are held briefly. When ``source`` is given, each commit also
+        records the shard's row offset in ``ingest_progress``; re-running the same
+        source skips the rows a shard already committed.
+        
+        Returns:
+            Report with per-shard row counts, the failed shards and overall success
+        """
+        n_shards = self.ingestion_config.write_shards
+        # Multiplicative hash so sequential product IDs spread across shards
+        shard_ids = (price_history_df['product_id'].to_numpy(dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(n_shards)
+        
+        offsets = self._load_progress(source, n_shards) if source else {}
+        report = {
+            'source': source,
+            'shards': n_shards,
+            'total_records': len(price_history_df),
+            'written_records': 0,
+            'resumed_records': sum(offsets.values()),
+            'failed_shards': [],
+            'success': False
+        }
+        
+        with ThreadPoolExecutor(max_workers=n_shards, thread_name_prefix="ingest-shard") as pool:
+            futures = {
+                shard: pool.submit(
+                    self._write_shard,
+                    shard,
+                    n_shards,
+                    price_history_df[shard_ids == shard],
+                    source,
+                    offsets.get(shard, 0)
+                )
+                for shard in range(n_shards)
+            }
+            for shard, future in futures.items():
+                written, error = future.result()
+                report['written_records'] += written
+                if error:
+                    report['failed_shards'].append({'shard': shard, 'error': error})
+        
+        report['success'] = not report['failed_shards']
+        if report['success']:
+            logger.info(f"Successfully ingested {report['total_records']} price records across {n_shards} shards")
+        else:
+            logger.error(f"{len(report['failed_shards'])} of {n_shards} shards failed; re-run {source} to resume")
+        return report
+    
+    def _write_shard(
+        self,
+        shard: int,
+        n_shards: int,
+        shard_df: pd.DataFrame,
+        source: Optional[str],
+        start_offset: int
+    ):
+        """Write one shard in bounded transactions; returns (rows written, error or None)."""
+        part = f"shard-{shard}/{n_shards}"
+        commit_rows = max(1, self.ingestion_config.shard_commit_rows)
+        written = 0
+        
+        # Plain Python values for the driver; dates as ISO strings without per-row boxing
+        product_ids = shard_df['product_id'].to_numpy().tolist()
+        ds_values = shard_df['ds'].to_numpy().astype('datetime64[D]').astype(str).tolist()
+        prices = shard_df['price'].to_numpy().tolist()
+        
+        try:
+            for start in range(start_offset, len(shard_df), commit_rows):
+                stop = min(start + commit_rows, len(shard_df))
+                rows = [
+                    {'product_id': product_ids[i], 'ds': ds_values[i], 'price': prices[i]}
+                    for i in range(start, stop)
+                ]
+                with self.engine.begin() as conn:
+                    conn.execute(text("""
+                        INSERT INTO price_history(product_id, ds, price)
+                        VALUES (:product_id, :ds, :price)
+                        ON DUPLICATE KEY UPDATE price = VALUES(price)
+                    """), rows)
+                    if source:
+                        self._save_progress(conn, source, part, stop, 'done' if stop == len(shard_df) else 'running')
+                written += stop - start
+            
+            if source and start_offset >= len(shard_df):
+                with self.engine.begin() as conn:
+                    self._save_progress(conn, source, part, len(shard_df), 'done')
+            return written, None
+            
+        except Exception as e:
+            logger.error(f"Error writing {part} of {source or 'batch'}: {e}")
+            return written, str(e)
+    
+    def _load_progress(self, source: str, n_shards: int) -> Dict[int, int]:
+        """Committed row offsets per shard from a previous run over the same source."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT part, row_offset, status
+                FROM ingest_progress
+                WHERE source = :source AND part LIKE :pattern
+            """), {"source": source, "pattern": f"shard-%/{n_shards}"}).fetchall()
+        
+        if rows and all(row.status == 'done' for row in rows) and len(rows) == n_shards:
+            # A completed load starts over so re-ingesting a changed file takes effect
+            return {}
+        return {int(row.part.split('/')[0].split('-')[1]): int(row.row_offset) for row in rows}
+    
+    @staticmethod
+    def _save_progress(
+        conn,
+        source: str,
+        part: str,
+        row_offset: int,
+        status: str,
+        byte_offset: Optional[int] = None
+    ) -> None:
+        conn.execute(text("""
+            INSERT INTO ingest_progress(source, part, row_offset, byte_offset, status)
+            VALUES (:source, :part, :row_offset, :byte_offset, :status)
+            ON DUPLICATE KEY UPDATE
+                row_offset = VALUES(row_offset),
+                byte_offset = VALUES(byte_offset),
+                status = VALUES(status)
+        """), {
+            "source": source,
+            "part": part,
+            "row_offset": row_offset,
+            "byte_offset": byte_offset,
+            "status": status
+        })
+    
     def get_ingestion_stats(self) -> Dict[str, Any]:
         """Get statistics about ingested data."""
         try:
@@ -226,9 +758,14 @@ def main():
     
     parser = argparse.ArgumentParser(description='PriceScout Data Ingestion Job')
     parser.add_argument('--s3-key', help='S3 object key for CSV file')
+    parser.add_argument('--s3-prefix', help='Ingest every data object (CSV, gzip/zstd CSV, Parquet) under this S3 prefix')
+    parser.add_argument('--start-date', help='First date to ingest from --s3-key (YYYY-MM-DD)')
+    parser.add_argument('--end-date', help='Last date to ingest from --s3-key (YYYY-MM-DD)')
     parser.add_argument('--local-file', help='Local CSV file path')
     parser.add_argument('--config', default='config/settings.toml', help='Configuration file path')
     parser.add_argument('--stats', action='store_true', help='Show ingestion statistics')
+    parser.add_argument('--rebuild-daily', action='store_true', help='Rebuild the regularized daily price series')
+    parser.add_argument('--rebuild-summary', action='store_true', help='Rebuild the per-product forecast summary table')
     
     args = parser.parse_args()
     
@@ -242,15 +779,44 @@ def main():
         for key, value in stats.items():
             print(f"  {key}: {value}")
     
+    elif args.rebuild_daily:
+        # Rebuild price_history_daily for all products
+        job.ingestion_config.maintain_daily_series = True
+        if job.rebuild_daily_series():
+            print("✅ Daily price series rebuilt successfully")
+        else:
+            print("❌ Daily price series rebuild failed")
+            exit(1)
+    
+    elif args.rebuild_summary:
+        # Rebuild product_forecast_summary for all products
+        try:
+            count = rebuild_product_summaries(job.engine)
+            print(f"✅ Forecast summary rebuilt for {count} products")
+        except Exception as e:
+            print(f"❌ Forecast summary rebuild failed: {e}")
+            exit(1)
+    
     elif args.s3_key:
         # Ingest from S3
-        success = job.ingest_from_s3(args.s3_key)
+        success = job.ingest_from_s3(args.s3_key, args.start_date, args.end_date)
         if success:
             print("✅ S3 ingestion completed successfully")
         else:
             print("❌ S3 ingestion failed")
             exit(1)
     
+    elif args.s3_prefix:
+        # Ingest every object under the prefix concurrently
+        report = job.ingest_from_s3_objects(prefix=args.s3_prefix)
+        print(f"Ingested {report['loaded_files']}/{report['total_files']} files ({report['total_records']} records)")
+        if not report['success']:
+            print("❌ Failed keys:")
+            for key in report['failed_keys']:
+                print(f"  - {key}")
+            exit(1)
+        print("✅ S3 prefix ingestion completed successfully")
+    
     elif args.local_file:
         # Ingest from local file
         success = job.ingest_from_local(args.local_file)
@@ -261,7 +827,7 @@ def main():
             exit(1)
     
     else:
-        print("Please specify --s3-key, --local-file, or --stats")
+        print("Please specify --s3-key, --s3-prefix, --local-file, --rebuild-daily, --rebuild-summary, or --stats")
         parser.print_help()
 
 if __name__ == "__main__":
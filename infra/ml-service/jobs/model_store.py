@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+PriceScout Model Store
+Persists serialized Prophet models per product/version and caches deserialized ones
+"""
+
+import gzip
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import boto3
+from pydantic_settings import BaseSettings
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactConfig(BaseSettings):
+    backend: str = "local"  # "local", "s3" or "none"
+    local_dir: str = "data/models"
+    s3_bucket: str = ""
+    s3_prefix: str = "models/"
+    cache_size: int = 64
+
+
+class ModelArtifactStore:
+    """Gzipped Prophet JSON artifacts on local disk or in S3, addressed by product and version."""
+
+    def __init__(self, config: ArtifactConfig, s3_client=None):
+        self.config = config
+        self.s3_client = s3_client
+        if config.backend == "s3" and self.s3_client is None:
+            self.s3_client = boto3.client('s3')
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.backend != "none"
+
+    def uri_for(self, product_id: int, model_version: str) -> str:
+        relative = f"{product_id}/{model_version}.json.gz"
+        if self.config.backend == "s3":
+            return f"s3://{self.config.s3_bucket}/{self.config.s3_prefix}{relative}"
+        return os.path.join(self.config.local_dir, relative)
+
+    def save(self, product_id: int, model_version: str, model_json: str) -> str:
+        """
+        Store a serialized model.
+
+        Returns:
+            URI of the stored artifact
+        """
+        uri = self.uri_for(product_id, model_version)
+        body = gzip.compress(model_json.encode('utf-8'))
+
+        if self.config.backend == "s3":
+            self.s3_client.put_object(
+                Bucket=self.config.s3_bucket,
+                Key=self._s3_key(uri),
+                Body=body,
+                ContentType='application/json',
+                ContentEncoding='gzip'
+            )
+        else:
+            os.makedirs(os.path.dirname(uri), exist_ok=True)
+            # Write-then-rename so readers never see a partial artifact
+            tmp_path = f"{uri}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, uri)
+
+        logger.info(f"Stored model artifact {uri} ({len(body)} bytes)")
+        return uri
+
+    def load(self, uri: str) -> str:
+        """Read a serialized model back as a JSON string."""
+        if uri.startswith("s3://"):
+            bucket = uri[len("s3://"):].split('/', 1)[0]
+            body = self.s3_client.get_object(Bucket=bucket, Key=self._s3_key(uri))['Body'].read()
+        else:
+            with open(uri, 'rb') as f:
+                body = f.read()
+        return gzip.decompress(body).decode('utf-8')
+
+    @staticmethod
+    def _s3_key(uri: str) -> str:
+        return uri[len("s3://"):].split('/', 1)[1]
+
+
+class ModelCache:
+    """Thread-safe LRU of deserialized models keyed by (product_id, model_version)."""
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._models: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached model for ``key``, calling ``loader`` and caching its result on a miss."""
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+
+        # Deserialize outside the lock; two concurrent misses just both load
+        model = loader()
+
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+        return model
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._models), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+_model_cache: Optional[ModelCache] = None
+_model_cache_lock = threading.Lock()
+
+
+def get_model_cache(max_size: int = 64) -> ModelCache:
+    """Process-wide model cache for the serving process."""
+    global _model_cache
+    with _model_cache_lock:
+        if _model_cache is None:
+            _model_cache = ModelCache(max_size)
+        return _model_cache
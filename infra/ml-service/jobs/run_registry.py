@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+PriceScout Run Registry
+Records training runs and per-product outcomes so runs can be resumed and scheduled from history
+"""
+
+import hashlib
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def new_run_id() -> str:
+    return f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def run_model_version(run_id: str) -> str:
+    """Model version shared by every product a run trains, stable across --resume and lease retries."""
+    version = f"prophet_{run_id}"
+    if len(version) > 50:
+        # model_metadata.model_version is VARCHAR(50)
+        version = f"prophet_{hashlib.sha1(run_id.encode()).hexdigest()[:16]}"
+    return version
+
+
+class RunRegistry:
+    """
+    ``training_runs`` / ``training_run_items`` access.
+
+    Each run lists the products it set out to train; every item moves from
+    ``pending`` to ``succeeded`` or ``failed`` with its duration and error, so a
+    crashed run can be resumed by retraining only the items that did not succeed.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def start_run(self, run_id: str, product_ids: List[int], mode: str = 'local', skipped: int = 0) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO training_runs (run_id, mode, status, total_products, skipped)
+                VALUES (:run_id, :mode, 'running', :total_products, :skipped)
+            """), {"run_id": run_id, "mode": mode, "total_products": len(product_ids), "skipped": skipped})
+            if product_ids:
+                conn.execute(text("""
+                    INSERT INTO training_run_items (run_id, product_id, status)
+                    VALUES (:run_id, :product_id, 'pending')
+                """), [{"run_id": run_id, "product_id": product_id} for product_id in product_ids])
+
+    def reopen_run(self, run_id: str) -> List[int]:
+        """
+        Mark a run as running again and return the products it still has to train.
+
+        Raises:
+            ValueError: If the run does not exist
+        """
+        with self.engine.begin() as conn:
+            result = conn.execute(text("""
+                UPDATE training_runs SET status = 'running', finished_at = NULL WHERE run_id = :run_id
+            """), {"run_id": run_id})
+            if result.rowcount == 0:
+                raise ValueError(f"Unknown training run: {run_id}")
+
+            rows = conn.execute(text("""
+                SELECT product_id FROM training_run_items
+                WHERE run_id = :run_id AND status <> 'succeeded'
+                ORDER BY product_id
+            """), {"run_id": run_id})
+            return [row.product_id for row in rows]
+
+    def record_item(
+        self,
+        run_id: str,
+        product_id: int,
+        status: str,
+        model_version: Optional[str] = None,
+        duration_seconds: Optional[float] = None,
+        error: Optional[str] = None
+    ) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO training_run_items
+                    (run_id, product_id, status, model_version, duration_seconds, error, finished_at)
+                VALUES (:run_id, :product_id, :status, :model_version, :duration_seconds, :error, NOW())
+                ON DUPLICATE KEY UPDATE
+                    status = VALUES(status),
+                    model_version = VALUES(model_version),
+                    duration_seconds = VALUES(duration_seconds),
+                    error = VALUES(error),
+                    finished_at = VALUES(finished_at)
+            """), {
+                "run_id": run_id,
+                "product_id": product_id,
+                "status": status,
+                "model_version": model_version,
+                "duration_seconds": duration_seconds,
+                "error": error
+            })
+
+    def finish_run(self, run_id: str) -> Dict[str, Any]:
+        """
+        Close a running run with totals computed from its items; returns the totals.
+
+        Closing an already closed run is a no-op, so every distributed worker that
+        sees the last batch settle may call this.
+        """
+        with self.engine.begin() as conn:
+            totals = conn.execute(text("""
+                SELECT
+                    SUM(status = 'succeeded') as successful,
+                    SUM(status = 'failed') as failed,
+                    SUM(status = 'pending') as pending
+                FROM training_run_items
+                WHERE run_id = :run_id
+            """), {"run_id": run_id}).fetchone()
+
+            successful, failed, pending = (int(value or 0) for value in totals)
+            conn.execute(text("""
+                UPDATE training_runs
+                SET status = :status, successful = :successful, failed = :failed, finished_at = NOW()
+                WHERE run_id = :run_id AND status = 'running'
+            """), {
+                "run_id": run_id,
+                "status": 'completed' if failed == 0 and pending == 0 else 'incomplete',
+                "successful": successful,
+                "failed": failed
+            })
+        return {'successful': successful, 'failed': failed, 'pending': pending}
+
+    def run_errors(self, run_id: str) -> List[str]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT error FROM training_run_items
+                WHERE run_id = :run_id AND status = 'failed' AND error IS NOT NULL
+                ORDER BY product_id
+            """), {"run_id": run_id})
+            return [row.error for row in rows]
+
+    def historical_durations(self, product_ids: List[int], last_n: int = 5) -> Dict[int, float]:
+        """Mean duration of each product's last ``last_n`` successful trainings."""
+        if not product_ids:
+            return {}
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT product_id, AVG(duration_seconds) as duration
+                FROM (
+                    SELECT product_id, duration_seconds,
+                           ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY finished_at DESC) as rn
+                    FROM training_run_items
+                    WHERE product_id IN :product_ids
+                      AND status = 'succeeded' AND duration_seconds IS NOT NULL
+                ) recent
+                WHERE rn <= :last_n
+                GROUP BY product_id
+            """).bindparams(bindparam("product_ids", expanding=True)),
+                {"product_ids": list(product_ids), "last_n": last_n})
+            return {row.product_id: float(row.duration) for row in rows}
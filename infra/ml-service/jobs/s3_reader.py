@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+PriceScout S3 Reader
+Streams price series objects from S3 as CSV (plain, gzip or zstd) or Parquet
+"""
+
+import io
+import logging
+from datetime import date
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ('sku', 'ds', 'y')
+CSV_DTYPES = {'sku': 'category'}
+DEFAULT_DATE_FORMAT = '%Y-%m-%d'
+SUPPORTED_SUFFIXES = ('.csv', '.csv.gz', '.gz', '.csv.zst', '.zst', '.zstd', '.parquet')
+
+# Parquet footers and row groups are fetched with ranged GETs of at least this size
+RANGE_BUFFER_SIZE = 1024 * 1024
+# Bytes fetched to find the CSV header line
+HEADER_PROBE_BYTES = 64 * 1024
+
+
+class PriceChunk(NamedTuple):
+    """A parsed slice of an object and the resume position just past it."""
+    frame: pd.DataFrame
+    row_offset: int
+    byte_offset: Optional[int]  # Only set for uncompressed CSV
+
+
+def detect_format(s3_key: str, content_encoding: Optional[str] = None) -> str:
+    """
+    Work out how an object is encoded from its key and Content-Encoding header.
+
+    Returns:
+        One of "parquet", "gzip", "zstd" or "csv"
+    """
+    key = s3_key.lower()
+    encoding = (content_encoding or '').lower()
+
+    if key.endswith('.parquet'):
+        return 'parquet'
+    if key.endswith('.gz') or encoding == 'gzip':
+        return 'gzip'
+    if key.endswith(('.zst', '.zstd')) or encoding == 'zstd':
+        return 'zstd'
+    return 'csv'
+
+
+class S3RangeFile(io.RawIOBase):
+    """Seekable read-only file over an S3 object, backed by ranged GET requests."""
+
+    def __init__(self, s3_client, bucket: str, key: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self.position = max(0, self.position)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+
+        end = min(self.position + len(buffer), self.size) - 1
+        response = self.s3_client.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f"bytes={self.position}-{end}"
+        )
+        data = response['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def read_price_frame(
+    s3_client,
+    bucket: str,
+    s3_key: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    columns: Sequence[str] = PRICE_COLUMNS,
+    date_format: str = DEFAULT_DATE_FORMAT
+) -> pd.DataFrame:
+    """
+    Read a price series object from S3 without buffering the whole body.
+
+    CSV bodies are parsed straight off the response stream (decompressing gzip or
+    zstd on the fly). Parquet objects are read through ranged GETs, projected to
+    ``columns`` and pruned to the row groups whose ``ds`` statistics overlap
+    [start_date, end_date].
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Bucket name
+        s3_key: Object key
+        start_date: Optional first date to keep (inclusive)
+        end_date: Optional last date to keep (inclusive)
+        columns: Columns to load
+        date_format: strftime format of ds in CSV objects (unparseable dates become NaT)
+
+    Returns:
+        DataFrame with the requested columns
+    """
+    if detect_format(s3_key) == 'parquet':
+        df = _read_parquet(s3_client, bucket, s3_key, start_date, end_date, list(columns))
+    else:
+        response = s3_client.get_object(Bucket=bucket, Key=s3_key)
+        fmt = detect_format(s3_key, response.get('ContentEncoding'))
+        compression = {'gzip': 'gzip', 'zstd': 'zstd'}.get(fmt)
+
+        try:
+            df = pd.read_csv(
+                response['Body'],
+                compression=compression,
+                usecols=lambda col: col in columns,
+                dtype=CSV_DTYPES
+            )
+        except ImportError as e:
+            raise ImportError(f"Reading {fmt} objects requires the 'zstandard' package: {e}") from e
+
+        if 'ds' in df.columns:
+            df['ds'] = pd.to_datetime(df['ds'], format=date_format, errors='coerce')
+
+    return filter_dates(df, start_date, end_date)
+
+
+def iter_price_chunks(
+    s3_client,
+    bucket: str,
+    s3_key: str,
+    row_offset: int = 0,
+    byte_offset: Optional[int] = None,
+    chunk_rows: int = 500000,
+    chunk_bytes: int = 64 * 1024 * 1024,
+    date_format: str = DEFAULT_DATE_FORMAT
+) -> Iterator[PriceChunk]:
+    """
+    Read an object in chunks that can be resumed from a previous position.
+
+    Uncompressed CSV is split on line boundaries into ~``chunk_bytes`` pieces and
+    resumes with a ranged GET from ``byte_offset``. Compressed CSV has to be
+    decompressed from the start, but rows before ``row_offset`` are skipped
+    without parsing. Parquet yields one chunk per row group and skips the groups
+    wholly before ``row_offset``.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Bucket name
+        s3_key: Object key
+        row_offset: Data rows already consumed
+        byte_offset: Bytes already consumed (uncompressed CSV only)
+        chunk_rows: Rows per chunk for compressed CSV
+        chunk_bytes: Bytes per chunk for uncompressed CSV
+        date_format: strftime format of ds in CSV objects
+
+    Yields:
+        PriceChunk with the parsed frame and the position after it
+    """
+    fmt = detect_format(s3_key)
+    if fmt == 'parquet':
+        yield from _iter_parquet_chunks(s3_client, bucket, s3_key, row_offset)
+        return
+
+    if fmt == 'csv':
+        head = s3_client.head_object(Bucket=bucket, Key=s3_key)
+        fmt = detect_format(s3_key, head.get('ContentEncoding'))
+
+    if fmt == 'csv':
+        yield from _iter_csv_byte_chunks(s3_client, bucket, s3_key, row_offset, byte_offset, chunk_bytes, date_format)
+        return
+
+    response = s3_client.get_object(Bucket=bucket, Key=s3_key)
+    reader = pd.read_csv(
+        response['Body'],
+        compression=fmt,
+        usecols=lambda col: col in PRICE_COLUMNS,
+        dtype=CSV_DTYPES,
+        skiprows=range(1, row_offset + 1),
+        chunksize=chunk_rows
+    )
+    for frame in reader:
+        row_offset += len(frame)
+        frame['ds'] = pd.to_datetime(frame['ds'], format=date_format, errors='coerce')
+        yield PriceChunk(frame, row_offset, None)
+
+
+def _iter_csv_byte_chunks(
+    s3_client,
+    bucket: str,
+    s3_key: str,
+    row_offset: int,
+    byte_offset: Optional[int],
+    chunk_bytes: int,
+    date_format: str
+) -> Iterator[PriceChunk]:
+    """Split an uncompressed CSV body on newlines, resuming with a ranged GET."""
+    probe = s3_client.get_object(
+        Bucket=bucket, Key=s3_key, Range=f"bytes=0-{HEADER_PROBE_BYTES - 1}"
+    )['Body'].read()
+    header_end = probe.find(b'\n') + 1
+    if header_end == 0:
+        raise ValueError(f"No header line found in the first {HEADER_PROBE_BYTES} bytes of {s3_key}")
+    header = probe[:header_end]
+
+    offset = max(byte_offset or 0, header_end)
+    size = s3_client.head_object(Bucket=bucket, Key=s3_key)['ContentLength']
+    if offset >= size:
+        return
+
+    body = s3_client.get_object(Bucket=bucket, Key=s3_key, Range=f"bytes={offset}-")['Body']
+    pending = b''
+    while True:
+        block = body.read(chunk_bytes)
+        data = pending + block
+        if not block:
+            cut = len(data)
+        else:
+            cut = data.rfind(b'\n') + 1
+            if cut == 0:
+                pending = data
+                continue
+
+        if data[:cut].strip():
+            frame = pd.read_csv(
+                io.BytesIO(header + data[:cut]),
+                usecols=lambda col: col in PRICE_COLUMNS,
+                dtype=CSV_DTYPES
+            )
+            frame['ds'] = pd.to_datetime(frame['ds'], format=date_format, errors='coerce')
+            offset += cut
+            row_offset += len(frame)
+            yield PriceChunk(frame, row_offset, offset)
+
+        if not block:
+            return
+        pending = data[cut:]
+
+
+def _iter_parquet_chunks(s3_client, bucket: str, s3_key: str, row_offset: int) -> Iterator[PriceChunk]:
+    """Yield one chunk per Parquet row group, skipping groups already consumed."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet objects requires the 'pyarrow' package") from e
+
+    raw = S3RangeFile(s3_client, bucket, s3_key)
+    parquet_file = pq.ParquetFile(io.BufferedReader(raw, buffer_size=RANGE_BUFFER_SIZE))
+
+    consumed = 0
+    for i in range(parquet_file.metadata.num_row_groups):
+        consumed += parquet_file.metadata.row_group(i).num_rows
+        if consumed <= row_offset:
+            continue
+        frame = parquet_file.read_row_group(i, columns=list(PRICE_COLUMNS)).to_pandas()
+        yield PriceChunk(frame, consumed, None)
+
+
+def _read_parquet(
+    s3_client,
+    bucket: str,
+    s3_key: str,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    columns: List[str]
+) -> pd.DataFrame:
+    """Read the projected columns of the row groups overlapping the date range."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet objects requires the 'pyarrow' package") from e
+
+    raw = S3RangeFile(s3_client, bucket, s3_key)
+    parquet_file = pq.ParquetFile(io.BufferedReader(raw, buffer_size=RANGE_BUFFER_SIZE))
+
+    row_groups = _prune_row_groups(parquet_file, start_date, end_date)
+    total_groups = parquet_file.metadata.num_row_groups
+    if not row_groups:
+        logger.info(f"No row groups of {s3_key} overlap the requested dates")
+        return pd.DataFrame(columns=columns)
+
+    table = parquet_file.read_row_groups(row_groups, columns=columns)
+    logger.info(
+        f"Read {len(row_groups)}/{total_groups} row groups of {s3_key} "
+        f"({raw.bytes_read} of {raw.size} bytes)"
+    )
+    return table.to_pandas()
+
+
+def _prune_row_groups(parquet_file, start_date: Optional[date], end_date: Optional[date]) -> List[int]:
+    """Return indices of row groups whose ds min/max statistics overlap the date range."""
+    num_groups = parquet_file.metadata.num_row_groups
+    if start_date is None and end_date is None:
+        return list(range(num_groups))
+
+    schema = parquet_file.schema_arrow
+    if 'ds' not in schema.names:
+        return list(range(num_groups))
+    ds_index = schema.get_field_index('ds')
+
+    start = pd.Timestamp(start_date) if start_date is not None else None
+    end = pd.Timestamp(end_date) if end_date is not None else None
+
+    keep = []
+    for i in range(num_groups):
+        stats = parquet_file.metadata.row_group(i).column(ds_index).statistics
+        if stats is None or not stats.has_min_max:
+            keep.append(i)
+            continue
+
+        group_min, group_max = _to_timestamp(stats.min), _to_timestamp(stats.max)
+        if start is not None and group_max < start:
+            continue
+        if end is not None and group_min > end:
+            continue
+        keep.append(i)
+    return keep
+
+
+def _to_timestamp(value: Any) -> pd.Timestamp:
+    if isinstance(value, bytes):
+        value = value.decode()
+    return pd.Timestamp(value)
+
+
+def filter_dates(df: pd.DataFrame, start_date: Optional[date], end_date: Optional[date]) -> pd.DataFrame:
+    """Drop rows outside [start_date, end_date]; row groups only prune at group granularity."""
+    if (start_date is None and end_date is None) or 'ds' not in df.columns:
+        return df
+
+    ds = df['ds'] if pd.api.types.is_datetime64_any_dtype(df['ds']) else pd.to_datetime(df['ds'], errors='coerce')
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= ds >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= ds <= pd.Timestamp(end_date)
+    return df[mask]
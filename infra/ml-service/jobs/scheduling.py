@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+PriceScout Training Scheduler
+Predicts per-product training cost and orders/packs fit units so parallel runs are not tail-bound
+"""
+
+import heapq
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (group key, products) as planned by the training job
+Unit = Tuple[Optional[str], List[Dict[str, Any]]]
+
+# Prior cost model until durations have been recorded: fixed per-fit cost plus per-point cost
+DEFAULT_BASE_SECONDS = 1.0
+DEFAULT_SECONDS_PER_POINT = 0.002
+
+
+class CostModel:
+    """
+    Predicted training seconds per product.
+
+    Products with recorded durations use them directly. The others are predicted
+    from their data point count with ``base + per_point * data_points``, fitted by
+    least squares on the products that have both; with too little history the
+    fixed prior is used.
+    """
+
+    def __init__(self, durations: Dict[int, float], data_points: Dict[int, int]):
+        self.durations = durations
+        self.data_points = data_points
+        self.base, self.per_point = self._fit()
+
+    def _fit(self) -> Tuple[float, float]:
+        known = [(self.data_points[pid], duration) for pid, duration in self.durations.items()
+                 if pid in self.data_points]
+        if len(known) < 2 or len({points for points, _ in known}) < 2:
+            if known:
+                # One size seen: scale the prior so it matches the observed durations
+                scale = np.median([duration for _, duration in known]) / np.median(
+                    [DEFAULT_BASE_SECONDS + DEFAULT_SECONDS_PER_POINT * points for points, _ in known])
+                return DEFAULT_BASE_SECONDS * scale, DEFAULT_SECONDS_PER_POINT * scale
+            return DEFAULT_BASE_SECONDS, DEFAULT_SECONDS_PER_POINT
+
+        points, seconds = (np.array(values, dtype='float64') for values in zip(*known))
+        per_point, base = np.polyfit(points, seconds, 1)
+        # A negative slope or intercept is noise; keep both non-negative
+        return max(float(base), 0.0), max(float(per_point), 0.0)
+
+    def cost(self, product: Dict[str, Any]) -> float:
+        recorded = self.durations.get(product['id'])
+        if recorded is not None:
+            return recorded
+        points = product.get('data_points') or self.data_points.get(product['id'], 0)
+        return self.base + self.per_point * points
+
+    def unit_cost(self, unit: Unit) -> float:
+        return sum(self.cost(product) for product in unit[1])
+
+
+def schedule_tasks(units: List[Unit], model: CostModel, pack_seconds: float) -> List[List[Unit]]:
+    """
+    Order units longest-first and pack small ones into shared tasks.
+
+    Units predicted to take at least ``pack_seconds`` are tasks of their own.
+    Smaller units are packed, largest first, into tasks of about ``pack_seconds``
+    so per-task overhead is paid once per pack. Tasks come back in descending
+    predicted cost, which keeps workers busy until the end of the run.
+    """
+    ranked = sorted(units, key=model.unit_cost, reverse=True)
+    if pack_seconds <= 0:
+        return [[unit] for unit in ranked]
+
+    tasks: List[List[Unit]] = []
+    costs: List[float] = []
+    pack: List[Unit] = []
+    pack_cost = 0.0
+    for unit in ranked:
+        cost = model.unit_cost(unit)
+        if cost >= pack_seconds:
+            tasks.append([unit])
+            costs.append(cost)
+            continue
+        pack.append(unit)
+        pack_cost += cost
+        if pack_cost >= pack_seconds:
+            tasks.append(pack)
+            costs.append(pack_cost)
+            pack, pack_cost = [], 0.0
+    if pack:
+        tasks.append(pack)
+        costs.append(pack_cost)
+
+    order = sorted(range(len(tasks)), key=lambda index: costs[index], reverse=True)
+    return [tasks[index] for index in order]
+
+
+def balance_batches(units: List[Unit], model: CostModel, batch_size: int) -> List[Tuple[List[Unit], float]]:
+    """
+    Split units into roughly equal-cost batches for distributed leases.
+
+    The batch count is what ``batch_size`` products per batch would give; units
+    are assigned longest-first to the currently cheapest batch (LPT), so no batch
+    ends up holding most of the expensive series.
+
+    Returns:
+        (units, predicted seconds) per batch, most expensive first
+    """
+    if not units:
+        return []
+
+    n_products = sum(len(unit[1]) for unit in units)
+    n_batches = min(len(units), max(1, math.ceil(n_products / max(1, batch_size))))
+    batches: List[List[Unit]] = [[] for _ in range(n_batches)]
+    costs = [0.0] * n_batches
+    cheapest = [(0.0, index) for index in range(n_batches)]
+
+    for unit in sorted(units, key=model.unit_cost, reverse=True):
+        cost, index = heapq.heappop(cheapest)
+        batches[index].append(unit)
+        costs[index] = cost + model.unit_cost(unit)
+        heapq.heappush(cheapest, (costs[index], index))
+
+    return sorted(zip(batches, costs), key=lambda batch: batch[1], reverse=True)
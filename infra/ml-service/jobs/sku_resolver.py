@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+PriceScout SKU Resolver
+Maps SKUs to product IDs, querying only the SKUs in a batch and caching known mappings
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# SKUs per IN (...) lookup
+LOOKUP_CHUNK_SIZE = 1000
+
+
+class SkuResolver:
+    """
+    Resolve SKUs to product IDs with a bounded LRU of known mappings.
+
+    Lookups only touch the SKUs that are not cached, and only SKUs that do not
+    exist yet are inserted, so the cost of a call scales with the batch rather
+    than the size of the products table. Missing products are inserted in their
+    own short transaction so the cache never holds IDs from a rolled-back write.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, engine: Engine, skus: Iterable[str]) -> Dict[str, int]:
+        """
+        Return product IDs for the given SKUs, creating products that don't exist.
+
+        Args:
+            engine: SQLAlchemy engine for the products table
+            skus: Distinct SKUs in the batch
+
+        Returns:
+            Dict mapping each SKU to its product ID
+        """
+        resolved: Dict[str, int] = {}
+        unknown: List[str] = []
+
+        with self._lock:
+            for sku in skus:
+                product_id = self._cache.get(sku)
+                if product_id is None:
+                    unknown.append(sku)
+                else:
+                    self._cache.move_to_end(sku)
+                    resolved[sku] = product_id
+            self.hits += len(resolved)
+            self.misses += len(unknown)
+
+        if unknown:
+            found = self._lookup(engine, unknown)
+            missing = [sku for sku in unknown if sku not in found]
+            if missing:
+                logger.info(f"Inserting {len(missing)} new products")
+                self._insert(engine, missing)
+                found.update(self._lookup(engine, missing))
+
+            resolved.update(found)
+            self._remember(found)
+
+        return resolved
+
+    def clear(self) -> None:
+        """Forget all cached mappings (e.g. after products are deleted)."""
+        with self._lock:
+            self._cache.clear()
+
+    def _lookup(self, engine: Engine, skus: List[str]) -> Dict[str, int]:
+        """
+        Product IDs keyed by the input strings.
+
+        The comparison is the column's collation (case-insensitive, and with PAD
+        SPACE collations blind to trailing spaces), so the stored ``sku`` can differ
+        from the input that matched it. Each input is looked up as a bound literal,
+        exactly as in a plain WHERE, and returned next to its ID, so the mapping is
+        keyed by what the caller passed in.
+        """
+        found = {}
+        with engine.connect() as conn:
+            for i in range(0, len(skus), LOOKUP_CHUNK_SIZE):
+                chunk = skus[i:i + LOOKUP_CHUNK_SIZE]
+                query = text(" UNION ALL ".join(
+                    f"SELECT :sku_{j} AS input_sku, (SELECT id FROM products WHERE sku = :sku_{j} LIMIT 1) AS id"
+                    for j in range(len(chunk))
+                ))
+                for row in conn.execute(query, {f"sku_{j}": sku for j, sku in enumerate(chunk)}):
+                    if row.id is not None:
+                        found[row.input_sku] = row.id
+        return found
+
+    def _insert(self, engine: Engine, skus: List[str]) -> None:
+        with engine.begin() as conn:
+            # The no-op update keeps concurrent inserts of the same SKU from failing
+            conn.execute(text("""
+                INSERT INTO products(sku, title)
+                VALUES (:sku, :title)
+                ON DUPLICATE KEY UPDATE sku = sku
+            """), [{"sku": sku, "title": sku} for sku in skus])  # Use SKU as title for now
+
+    def _remember(self, mappings: Dict[str, int]) -> None:
+        with self._lock:
+            for sku, product_id in mappings.items():
+                self._cache[sku] = product_id
+                self._cache.move_to_end(sku)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+
+_resolvers: Dict[str, SkuResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(database_url: str, max_size: int = 100000) -> SkuResolver:
+    """Return the process-wide resolver for a database, so the cache outlives individual jobs."""
+    with _resolvers_lock:
+        resolver = _resolvers.get(database_url)
+        if resolver is None:
+            resolver = SkuResolver(max_size)
+            _resolvers[database_url] = resolver
+        return resolver
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+PriceScout Stan Backend
+Explicit control of the Prophet Stan backend: reuse, temp-file placement, logging and fit timing
+"""
+
+import atexit
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.models import StanBackendEnum
+from pydantic_settings import BaseSettings
+
+logger = logging.getLogger(__name__)
+
+
+class StanConfig(BaseSettings):
+    backend: str = "CMDSTANPY"
+    reuse_backend: bool = True  # one loaded backend per worker thread/process
+    tmp_dir: str = "/dev/shm"  # tmpfs for cmdstan input/output files ("" = system default)
+    quiet_logging: bool = True
+
+
+_settings = StanConfig()
+_local = threading.local()
+_scratch = {'pid': None, 'dir': None}
+_stats_lock = threading.Lock()
+_stats = {'backend_loads': 0, 'backend_load_seconds': 0.0, 'fits': 0, 'fit_seconds': 0.0}
+
+
+def configure_stan(config: StanConfig) -> None:
+    """
+    Apply Stan settings for this process (also used as a worker-process initializer).
+
+    cmdstanpy picks its scratch directory when it is imported, so besides passing
+    ``output_dir`` on every fit, the module-level scratch directory is moved to
+    ``tmp_dir`` as well; data and init JSON files are written there. The scratch
+    directory is created once per process and removed at exit.
+    """
+    global _settings
+    _settings = config
+
+    if config.quiet_logging:
+        # cmdstanpy logs every chain start/stop at INFO, which costs more than short fits
+        for name in ('cmdstanpy', 'prophet'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    tmp_dir = _resolve_tmp_dir()
+    if tmp_dir and _scratch['pid'] != os.getpid():
+        scratch = tempfile.mkdtemp(prefix='cmdstan-', dir=tmp_dir)
+        _scratch.update(pid=os.getpid(), dir=scratch)
+        atexit.register(shutil.rmtree, scratch, True)
+        for name, module in list(sys.modules.items()):
+            if name.startswith('cmdstanpy') and hasattr(module, '_TMPDIR'):
+                module._TMPDIR = scratch
+
+
+def _resolve_tmp_dir() -> Optional[str]:
+    tmp_dir = _settings.tmp_dir
+    if tmp_dir and os.path.isdir(tmp_dir) and os.access(tmp_dir, os.W_OK):
+        return tmp_dir
+    if tmp_dir:
+        logger.debug(f"Stan tmp_dir {tmp_dir} is not writable; using the system temp directory")
+    return None
+
+
+def _load_backend(name: str):
+    started = time.perf_counter()
+    backend = StanBackendEnum.get_backend_class(name)()
+    elapsed = time.perf_counter() - started
+    with _stats_lock:
+        _stats['backend_loads'] += 1
+        _stats['backend_load_seconds'] += elapsed
+    return backend
+
+
+def get_stan_backend(name: Optional[str] = None):
+    """
+    The loaded Stan backend for this worker thread.
+
+    A backend keeps the last fit on itself, so it is shared between the models a
+    thread fits one after another but never between threads.
+    """
+    name = name or _settings.backend
+    backends = getattr(_local, 'backends', None)
+    if backends is None:
+        backends = _local.backends = {}
+    if name not in backends:
+        backends[name] = _load_backend(name)
+    return backends[name]
+
+
+class ManagedProphet(Prophet):
+    """Prophet that reuses the worker's Stan backend, writes fit files to tmpfs and times fits.
+
+    cmdstanpy keeps its CSV and console files whenever ``output_dir`` is given, so
+    each fit gets its own directory that is removed as soon as the fit returns;
+    results are already in memory by then.
+    """
+
+    fit_seconds: float = 0.0
+
+    def _load_stan_backend(self, stan_backend):
+        if _settings.reuse_backend:
+            self.stan_backend = get_stan_backend(stan_backend)
+        else:
+            self.stan_backend = _load_backend(stan_backend or _settings.backend)
+
+    def fit(self, df, **kwargs):
+        tmp_dir = _resolve_tmp_dir()
+        started = time.perf_counter()
+        if tmp_dir and 'output_dir' not in kwargs:
+            with tempfile.TemporaryDirectory(prefix='prophet-fit-', dir=tmp_dir) as output_dir:
+                result = super().fit(df, output_dir=output_dir, **kwargs)
+        else:
+            result = super().fit(df, **kwargs)
+        self.fit_seconds = time.perf_counter() - started
+
+        with _stats_lock:
+            _stats['fits'] += 1
+            _stats['fit_seconds'] += self.fit_seconds
+        return result
+
+
+def make_prophet(**params) -> Prophet:
+    """Prophet model for training, using the managed backend."""
+    return ManagedProphet(**params)
+
+
+def fit_stats() -> Dict[str, Any]:
+    """Counters for this process since start (or the last ``reset_fit_stats``)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['fit_seconds_mean'] = stats['fit_seconds'] / stats['fits'] if stats['fits'] else 0.0
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in stats.items()}
+
+
+def reset_fit_stats() -> None:
+    with _stats_lock:
+        _stats.update({'backend_loads': 0, 'backend_load_seconds': 0.0, 'fits': 0, 'fit_seconds': 0.0})
+
+
+def measure_fit_overhead(n_fits: int = 20, n_points: int = 60) -> Dict[str, float]:
+    """
+    Benchmark the fixed cost of a fit on a tiny series, where optimization is negligible.
+
+    Fits the same short synthetic series ``n_fits`` times with a stock Prophet
+    (a new backend per model) and with the managed model, and reports the mean
+    seconds per fit for each. Logging and scratch-directory settings from
+    ``configure_stan`` apply to both.
+    """
+    ds = pd.date_range('2023-01-01', periods=n_points, freq='D')
+    y = 100 + np.sin(np.arange(n_points) / 7.0) + np.random.default_rng(0).normal(0, 0.5, n_points)
+    history = pd.DataFrame({'ds': ds, 'y': y})
+    params = {'weekly_seasonality': True, 'yearly_seasonality': False, 'daily_seasonality': False}
+
+    def mean_fit_seconds(factory) -> float:
+        started = time.perf_counter()
+        for _ in range(n_fits):
+            factory(**params).fit(history)
+        return (time.perf_counter() - started) / n_fits
+
+    stock = mean_fit_seconds(Prophet)
+    managed = mean_fit_seconds(make_prophet)
+    return {
+        'fits': n_fits,
+        'stock_seconds_per_fit': round(stock, 4),
+        'managed_seconds_per_fit': round(managed, 4),
+        'saved_seconds_per_fit': round(stock - managed, 4)
+    }
@@ -6,18 +6,32 @@ Trains Prophet models for price forecasting and stores predictions in RDS
 
 import os
 import logging
+import queue
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, NamedTuple, Optional, Tuple
 import json
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 from prophet import Prophet
 from prophet.diagnostics import cross_validation, performance_metrics
+from prophet.serialize import model_to_json
 from pydantic_settings import BaseSettings
 import toml
 import numpy as np
 
+from jobs.model_store import ArtifactConfig, ModelArtifactStore
+from jobs.forecast_summary import refresh_forecast_summary
+from jobs.forecast_writer import prune_chunk_hashes, write_forecast_diff
+from jobs.grouped_training import build_groups, fit_group_seasonality, fit_sku_adjustment
+from jobs.tuning import HyperparameterTuner, TuningConfig, load_tuned_params, tuned_model_params
+from jobs.distributed import DistributedConfig, LeaseHeartbeat, LeaseQueue, default_worker_id
+from jobs.run_registry import RunRegistry, new_run_id, run_model_version
+from jobs.scheduling import CostModel, balance_batches, schedule_tasks
+from jobs.stan_backend import StanConfig, configure_stan, fit_stats, make_prophet, measure_fit_overhead, reset_fit_stats
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,6 +61,23 @@ class TrainingConfig(BaseSettings):
     forecast_periods: int = 365
     validation_split: float = 0.2
     retrain_frequency_days: int = 7
+    fetch_batch_size: int = 200
+    fit_workers: int = 1
+    pipeline_queue_size: int = 32
+    use_daily_series: bool = False
+    grouped_training: bool = False
+    group_prefix_words: int = 2
+    min_group_size: int = 3
+    write_chunk_rows: int = 64
+    pack_target_seconds: float = 5.0
+
+class FitResult(NamedTuple):
+    """A fitted product model, ready to be stored."""
+    forecast_data: pd.DataFrame
+    performance_metrics: Dict[str, Any]
+    model_json: Optional[str]
+    model_type: str
+    model_params: Dict[str, Any]
 
 class ProphetTrainingJob:
     def __init__(self, config_path: str = "config/settings.toml"):
@@ -55,9 +86,19 @@ class ProphetTrainingJob:
         self.db_config = DatabaseConfig(**self.config["database"])
         self.prophet_config = ProphetConfig(**self.config["prophet"])
         self.training_config = TrainingConfig(**self.config["training"])
+        self.tuning_config = TuningConfig(**self.config.get("tuning", {}))
+        self.stan_config = StanConfig(**self.config.get("stan", {}))
+        self.distributed_config = DistributedConfig(**self.config.get("distributed", {}))
+        configure_stan(self.stan_config)
         
         # Initialize database connection
         self.engine = create_engine(self.db_config.url)
+        
+        # Serialized models are kept so predictions can be made without refitting
+        self.artifact_store = ModelArtifactStore(ArtifactConfig(**self.config.get("artifacts", {})))
+        
+        # Per-run, per-product outcomes for resuming runs and scheduling by past durations
+        self.run_registry = RunRegistry(self.engine)
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from TOML file."""
@@ -114,13 +155,21 @@ class ProphetTrainingJob:
             logger.error(f"Error getting products for training: {e}")
             return []
     
-    def train_product_model(self, product_id: int, model_version: str = None) -> bool:
+    def train_product_model(
+        self,
+        product_id: int,
+        model_version: str = None,
+        training_data: Optional[pd.DataFrame] = None,
+        tune: bool = False
+    ) -> bool:
         """
         Train Prophet model for a specific product.
         
         Args:
             product_id: Product ID to train model for
             model_version: Model version string (defaults to timestamp)
+            training_data: Prefetched ds/y history (fetched from the DB if omitted)
+            tune: Search hyperparameters first instead of reusing stored tuned ones
             
         Returns:
             bool: True if successful, False otherwise
@@ -132,51 +181,20 @@ class ProphetTrainingJob:
             logger.info(f"Training Prophet model for product {product_id} (version: {model_version})")
             
             # Get training data
-            training_data = self._get_training_data(product_id)
-            if training_data.empty:
-                logger.warning(f"No training data found for product {product_id}")
-                return False
-            
-            if len(training_data) < self.training_config.min_data_points:
-                logger.warning(f"Insufficient data points for product {product_id}: {len(training_data)} < {self.training_config.min_data_points}")
-                return False
-            
-            # Prepare data for Prophet
-            prophet_data = training_data[['ds', 'y']].copy()
-            prophet_data.columns = ['ds', 'y']  # Prophet expects these exact column names
-            
-            # Initialize and configure Prophet
-            model = Prophet(
-                weekly_seasonality=self.prophet_config.weekly_seasonality,
-                yearly_seasonality=self.prophet_config.yearly_seasonality,
-                daily_seasonality=self.prophet_config.daily_seasonality,
-                seasonality_mode=self.prophet_config.seasonality_mode,
-                changepoint_prior_scale=self.prophet_config.changepoint_prior_scale,
-                seasonality_prior_scale=self.prophet_config.seasonality_prior_scale
-            )
-            
-            # Train the model
-            logger.info(f"Fitting Prophet model with {len(prophet_data)} data points...")
-            model.fit(prophet_data)
-            
-            # Generate forecasts
-            future = model.make_future_dataframe(periods=self.training_config.forecast_periods)
-            forecast = model.predict(future)
+            if training_data is None:
+                training_data = self._get_training_data(product_id)
             
-            # Prepare forecast data for database
-            forecast_data = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
-            forecast_data['product_id'] = product_id
-            forecast_data['model_version'] = model_version
-            forecast_data['ds'] = pd.to_datetime(forecast_data['ds']).dt.date
+            if tune:
+                tuned = self.tune_products({product_id: training_data}).get(product_id)
+            else:
+                tuned = self._load_tuned_params([product_id]).get(product_id)
             
-            # Calculate performance metrics
-            performance_metrics_data = self._calculate_performance_metrics(model, prophet_data)
+            fitted = self._fit_product_model(product_id, model_version, training_data, tuned)
+            if fitted is None:
+                return False
             
             # Store results in database
-            success = self._store_training_results(
-                product_id, model_version, forecast_data, 
-                performance_metrics_data, training_data
-            )
+            success = self._store_training_results(product_id, model_version, fitted, training_data)
             
             if success:
                 logger.info(f"✅ Successfully trained model for product {product_id}")
@@ -189,19 +207,177 @@ class ProphetTrainingJob:
             logger.error(f"Error training model for product {product_id}: {e}")
             return False
     
+    @property
+    def _history_table(self) -> str:
+        """Gap-filled daily series when enabled, otherwise the raw observations."""
+        return "price_history_daily" if self.training_config.use_daily_series else "price_history"
+    
+    def _prophet_params(self) -> Dict[str, Any]:
+        """Prophet keyword arguments from the [prophet] settings."""
+        return {
+            'weekly_seasonality': self.prophet_config.weekly_seasonality,
+            'yearly_seasonality': self.prophet_config.yearly_seasonality,
+            'daily_seasonality': self.prophet_config.daily_seasonality,
+            'seasonality_mode': self.prophet_config.seasonality_mode,
+            'changepoint_prior_scale': self.prophet_config.changepoint_prior_scale,
+            'seasonality_prior_scale': self.prophet_config.seasonality_prior_scale
+        }
+    
+    def _has_enough_history(self, product_id: int, training_data: pd.DataFrame) -> bool:
+        if training_data.empty:
+            logger.warning(f"No training data found for product {product_id}")
+            return False
+        
+        if len(training_data) < self.training_config.min_data_points:
+            logger.warning(f"Insufficient data points for product {product_id}: {len(training_data)} < {self.training_config.min_data_points}")
+            return False
+        return True
+    
+    def _fit_product_model(
+        self,
+        product_id: int,
+        model_version: str,
+        training_data: pd.DataFrame,
+        tuned_params: Optional[Dict[str, Any]] = None
+    ) -> Optional[FitResult]:
+        """
+        Fit a Prophet model on prefetched history and build its forecast rows.
+        
+        This is the CPU-bound part of training and touches no database state.
+        ``tuned_params`` (model_params from a tuning run) override the [prophet]
+        settings and are stored again with the new model.
+        
+        Returns:
+            FitResult, or None if the history is unusable
+        """
+        if not self._has_enough_history(product_id, training_data):
+            return None
+        
+        # Prepare data for Prophet
+        prophet_data = training_data[['ds', 'y']].copy()
+        prophet_data.columns = ['ds', 'y']  # Prophet expects these exact column names
+        
+        # Initialize and configure Prophet
+        prophet_params = self._prophet_params()
+        model_params = {**prophet_params, **(tuned_params or {})}
+        model = make_prophet(**{key: model_params[key] for key in prophet_params})
+        
+        # Train the model
+        logger.info(f"Fitting Prophet model with {len(prophet_data)} data points...")
+        model.fit(prophet_data)
+        
+        # Generate forecasts
+        future = model.make_future_dataframe(periods=self.training_config.forecast_periods)
+        forecast = model.predict(future)
+        
+        # Prepare forecast data for database; product_id/model_version are bound per
+        # statement rather than repeated on every row
+        forecast_data = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
+        
+        # Calculate performance metrics
+        performance_metrics_data = self._calculate_performance_metrics(model, prophet_data)
+        
+        model_json = model_to_json(model) if self.artifact_store.enabled else None
+        
+        return FitResult(forecast_data, performance_metrics_data, model_json, 'prophet', model_params)
+    
+    def _fit_product_group(
+        self,
+        group: str,
+        members: List[Dict[str, Any]],
+        histories: Dict[int, pd.DataFrame]
+    ) -> Dict[int, FitResult]:
+        """
+        Fit a product group: one Prophet seasonality fit plus a linear level/trend per SKU.
+        
+        Members without enough history are left out of the result; the caller
+        treats them as failed, exactly as in per-product training.
+        
+        Returns:
+            FitResult per product ID
+        """
+        usable = {
+            product['id']: histories[product['id']]
+            for product in members
+            if self._has_enough_history(product['id'], histories[product['id']])
+        }
+        if not usable:
+            return {}
+        
+        logger.info(f"Fitting shared seasonality for group '{group}' ({len(usable)} products)...")
+        prophet_params = self._prophet_params()
+        seasonality = fit_group_seasonality(usable, prophet_params, self.training_config.forecast_periods)
+        model_params = {**prophet_params, 'group': group, 'group_size': len(usable)}
+        
+        fitted = {}
+        for product_id, history in usable.items():
+            forecast_data, metrics = fit_sku_adjustment(
+                history,
+                seasonality,
+                self.training_config.forecast_periods,
+                validation_split=self.training_config.validation_split
+            )
+            fitted[product_id] = FitResult(forecast_data, metrics, None, 'prophet_grouped', model_params)
+        return fitted
+    
+    def tune_products(self, histories: Dict[int, pd.DataFrame]) -> Dict[int, Dict[str, Any]]:
+        """
+        Search Prophet hyperparameters for several products within the [tuning] time budget.
+        
+        Args:
+            histories: ds/y history per product
+            
+        Returns:
+            Dict mapping product ID to model_params flagged as tuned (products that
+            could not be tuned are omitted and keep the [prophet] settings)
+        """
+        tuner = HyperparameterTuner(self.tuning_config, self._prophet_params(), self.stan_config)
+        started = time.perf_counter()
+        results = tuner.tune(histories)
+        logger.info(f"Tuned {len(results)}/{len(histories)} products in {time.perf_counter() - started:.1f}s")
+        return {product_id: tuned_model_params(result) for product_id, result in results.items()}
+    
+    def _load_tuned_params(self, product_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Tuned model_params of the active model per product, so retrains skip the search."""
+        if not product_ids:
+            return {}
+        
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT product_id, model_params
+                    FROM model_metadata
+                    WHERE product_id IN :product_ids AND is_active = 1
+                """).bindparams(bindparam("product_ids", expanding=True)), {"product_ids": list(product_ids)})
+                
+                tuned = {}
+                for row in rows:
+                    params = load_tuned_params(row.model_params)
+                    if params:
+                        tuned[row.product_id] = params
+                return tuned
+                
+        except Exception as e:
+            logger.warning(f"Error loading tuned parameters: {e}")
+            return {}
+    
+    def measure_fit_overhead(self, n_fits: int = 20) -> Dict[str, float]:
+        """Mean seconds per fit on a tiny series, stock Prophet vs the managed Stan backend."""
+        return measure_fit_overhead(n_fits)
+    
     def _get_training_data(self, product_id: int) -> pd.DataFrame:
         """Get training data for a specific product."""
         try:
             with self.engine.begin() as conn:
-                query = text("""
+                query = text(f"""
                     SELECT ds, price as y
-                    FROM price_history
+                    FROM {self._history_table}
                     WHERE product_id = :product_id
                     ORDER BY ds
                 """)
                 
-                df = pd.read_sql(query, conn, params={"product_id": product_id})
-                df['ds'] = pd.to_datetime(df['ds'])
+                df = pd.read_sql(query, conn, params={"product_id": product_id}, parse_dates=['ds'])
+                df['y'] = df['y'].astype('float32')
                 
                 return df
                 
@@ -209,6 +385,54 @@ class ProphetTrainingJob:
             logger.error(f"Error getting training data for product {product_id}: {e}")
             return pd.DataFrame()
     
+    def _get_training_data_batch(self, product_ids: List[int]) -> Dict[int, pd.DataFrame]:
+        """
+        Get training data for a block of products with a single range query.
+        
+        Rows come back ordered by (product_id, ds), so each product's history is a
+        contiguous slice of the result and can be handed out without copying.
+        
+        Args:
+            product_ids: Product IDs to fetch history for
+            
+        Returns:
+            Dict mapping product ID to its ds/y frame (products without rows are omitted)
+        """
+        if not product_ids:
+            return {}
+        
+        try:
+            with self.engine.begin() as conn:
+                query = text(f"""
+                    SELECT product_id, ds, price as y
+                    FROM {self._history_table}
+                    WHERE product_id IN :product_ids
+                    ORDER BY product_id, ds
+                """).bindparams(bindparam("product_ids", expanding=True))
+                
+                df = pd.read_sql(query, conn, params={"product_ids": list(product_ids)}, parse_dates=['ds'])
+            
+            if df.empty:
+                return {}
+            
+            df['y'] = df['y'].astype('float32')
+            ids = df['product_id'].to_numpy()
+            series = df[['ds', 'y']]
+            
+            # Boundaries between products in the sorted result
+            bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+            starts = np.concatenate(([0], bounds))
+            stops = np.concatenate((bounds, [len(df)]))
+            
+            return {
+                int(ids[start]): series.iloc[start:stop]
+                for start, stop in zip(starts, stops)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting training data for {len(product_ids)} products: {e}")
+            return {}
+    
     def _calculate_performance_metrics(self, model: Prophet, training_data: pd.DataFrame) -> Dict[str, Any]:
         """Calculate performance metrics for the trained model."""
         try:
@@ -239,102 +463,522 @@ class ProphetTrainingJob:
         self, 
         product_id: int, 
         model_version: str, 
-        forecast_data: pd.DataFrame,
-        performance_metrics: Dict[str, Any],
+        fitted: FitResult,
         training_data: pd.DataFrame
     ) -> bool:
-        """Store training results in the database."""
+        """
+        Store training results in the database (and the model artifact, if any).
+        
+        Everything for the product is written in one transaction, so a rerun after a
+        partial failure starts from a consistent state. Forecast chunks whose content
+        is unchanged for this model version are skipped, the metadata row is upserted,
+        and the active version is flipped by a single statement at the end.
+        """
         try:
+            # Artifact first, so active metadata never points at a missing model
+            artifact_uri = None
+            if fitted.model_json is not None:
+                artifact_uri = self.artifact_store.save(product_id, model_version, fitted.model_json)
+            
             with self.engine.begin() as conn:
-                # Store forecasts
-                forecast_data.to_sql('forecasts_staging', conn, if_exists='replace', index=False)
-                
-                conn.execute(text("""
-                    INSERT INTO forecasts(product_id, ds, yhat, yhat_lower, yhat_upper, model_version)
-                    SELECT product_id, ds, yhat, yhat_lower, yhat_upper, model_version 
-                    FROM forecasts_staging
-                    ON DUPLICATE KEY UPDATE
-                        yhat = VALUES(yhat),
-                        yhat_lower = VALUES(yhat_lower),
-                        yhat_upper = VALUES(yhat_upper)
-                """))
+                # Store forecasts (only chunks that changed since the last write of this version)
+                written, skipped = write_forecast_diff(
+                    conn, product_id, model_version, fitted.forecast_data, self.training_config.write_chunk_rows
+                )
+                logger.info(f"Product {product_id}: wrote {written} forecast rows, skipped {skipped} unchanged")
                 
                 # Store model metadata
                 model_metadata = {
                     'product_id': product_id,
                     'model_version': model_version,
-                    'model_type': 'prophet',
+                    'model_type': fitted.model_type,
                     'training_data_start': training_data['ds'].min().date(),
                     'training_data_end': training_data['ds'].max().date(),
-                    'model_params': {
-                        'weekly_seasonality': self.prophet_config.weekly_seasonality,
-                        'yearly_seasonality': self.prophet_config.yearly_seasonality,
-                        'daily_seasonality': self.prophet_config.daily_seasonality,
-                        'seasonality_mode': self.prophet_config.seasonality_mode,
-                        'changepoint_prior_scale': self.prophet_config.changepoint_prior_scale,
-                        'seasonality_prior_scale': self.prophet_config.seasonality_prior_scale
-                    },
-                    'performance_metrics': performance_metrics,
-                    'is_active': True
+                    'model_params': json.dumps(fitted.model_params),
+                    'performance_metrics': json.dumps(fitted.performance_metrics),
+                    'artifact_uri': artifact_uri
                 }
                 
-                # Deactivate old models for this product
-                conn.execute(text("""
-                    UPDATE model_metadata 
-                    SET is_active = 0 
-                    WHERE product_id = :product_id
-                """), {"product_id": product_id})
-                
-                # Insert new model metadata
+                # Upsert model metadata (a rerun of the same version updates its row)
                 conn.execute(text("""
                     INSERT INTO model_metadata 
                     (product_id, model_version, model_type, training_data_start, 
-                     training_data_end, model_params, performance_metrics, is_active)
+                     training_data_end, model_params, performance_metrics, artifact_uri, is_active)
                     VALUES 
                     (:product_id, :model_version, :model_type, :training_data_start,
-                     :training_data_end, :model_params, :performance_metrics, :is_active)
+                     :training_data_end, :model_params, :performance_metrics, :artifact_uri, 0)
+                    ON DUPLICATE KEY UPDATE
+                        model_type = VALUES(model_type),
+                        training_data_start = VALUES(training_data_start),
+                        training_data_end = VALUES(training_data_end),
+                        model_params = VALUES(model_params),
+                        performance_metrics = VALUES(performance_metrics),
+                        artifact_uri = COALESCE(VALUES(artifact_uri), artifact_uri)
                 """), model_metadata)
                 
+                # Flip the active version in one statement
+                conn.execute(text("""
+                    UPDATE model_metadata 
+                    SET is_active = (model_version = :model_version)
+                    WHERE product_id = :product_id
+                """), {"product_id": product_id, "model_version": model_version})
+                prune_chunk_hashes(conn, product_id, model_version)
+                
+                # Keep the products overview row in step with the new active model
+                refresh_forecast_summary(conn, [product_id])
+                
                 return True
                 
         except Exception as e:
             logger.error(f"Error storing training results: {e}")
             return False
     
-    def train_all_products(self) -> Dict[str, Any]:
-        """Train models for all products that need training."""
-        logger.info("Starting training for all products...")
+    def train_all_products(
+        self,
+        tune: bool = False,
+        resume_run_id: Optional[str] = None,
+        model_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Train models for all products that need training.
         
-        products = self.get_products_for_training()
-        results = {
-            'total_products': len(products),
-            'successful': 0,
-            'failed': 0,
-            'skipped': 0,
-            'errors': []
-        }
+        With ``tune`` the products are first put through a hyperparameter search;
+        otherwise products keep any tuned parameters stored with their active model.
+        Every run is recorded in the run registry; ``resume_run_id`` continues an
+        earlier run, retraining only the products it did not finish successfully.
         
-        for product in products:
-            try:
+        All products of a run share one model version, ``model_version`` or else one
+        derived from the run ID, so a resumed run rewrites the same version and its
+        unchanged forecast chunks are skipped.
+        """
+        logger.info("Starting training for all products...")
+        
+        if resume_run_id:
+            run_id = resume_run_id
+            remaining = set(self.run_registry.reopen_run(run_id))
+            to_train = {product['id']: product for product in self._get_products(list(remaining))}
+            results = {'total_products': len(to_train), 'successful': 0, 'failed': 0, 'skipped': 0, 'errors': []}
+            logger.info(f"Resuming run {run_id}: {len(to_train)} products left")
+        else:
+            products = self.get_products_for_training()
+            results = {
+                'total_products': len(products),
+                'successful': 0,
+                'failed': 0,
+                'skipped': 0,
+                'errors': []
+            }
+            
+            to_train = {}
+            for product in products:
                 if product['needs_retrain']:
-                    success = self.train_product_model(product['id'])
-                    if success:
-                        results['successful'] += 1
-                    else:
-                        results['failed'] += 1
-                        results['errors'].append(f"Failed to train product {product['id']} ({product['sku']})")
+                    to_train[product['id']] = product
                 else:
                     results['skipped'] += 1
                     logger.info(f"Skipping product {product['id']} ({product['sku']}) - recently trained")
-                    
+            
+            run_id = new_run_id()
+            self.run_registry.start_run(run_id, list(to_train), skipped=results['skipped'])
+        results['run_id'] = run_id
+        
+        units = self._plan_units(list(to_train.values()), results)
+        
+        reset_fit_stats()
+        started = time.perf_counter()
+        tuned = {}
+        if tune:
+            histories = {}
+            product_ids = [product['id'] for _, members in units if len(members) == 1 for product in members]
+            batch_size = max(1, self.training_config.fetch_batch_size)
+            for i in range(0, len(product_ids), batch_size):
+                histories.update(self._get_training_data_batch(product_ids[i:i + batch_size]))
+            tuned = self.tune_products(histories)
+            results['tuned'] = len(tuned)
+        
+        tasks = schedule_tasks(units, self._cost_model(units), self.training_config.pack_target_seconds)
+        self._run_training_pipeline(
+            tasks, results, tuned, run_id, model_version=model_version or run_model_version(run_id)
+        )
+        elapsed = time.perf_counter() - started
+        self.run_registry.finish_run(run_id)
+        
+        trained = results['successful'] + results['failed']
+        results['elapsed_seconds'] = round(elapsed, 2)
+        results['products_per_second'] = round(trained / elapsed, 3) if elapsed > 0 else 0.0
+        # Includes cross-validation fits; tuning fits run in worker processes and are not counted
+        results['fit_stats'] = fit_stats()
+        
+        logger.info(f"Training completed: {results['successful']} successful, {results['failed']} failed, {results['skipped']} skipped")
+        logger.info(f"Pipeline throughput: {results['products_per_second']} products/s over {results['elapsed_seconds']}s")
+        logger.info(f"Stan fits: {results['fit_stats']['fits']} at {results['fit_stats']['fit_seconds_mean']}s each, "
+                    f"{results['fit_stats']['backend_loads']} backend loads")
+        return results
+    
+    def _get_products(self, product_ids: List[int]) -> List[Dict[str, Any]]:
+        """Product rows (id, sku, title, data_points) for the given IDs."""
+        if not product_ids:
+            return []
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT p.id, p.sku, p.title,
+                       (SELECT COUNT(*) FROM price_history ph WHERE ph.product_id = p.id) as data_points
+                FROM products p
+                WHERE p.id IN :product_ids
+                ORDER BY p.id
+            """).bindparams(bindparam("product_ids", expanding=True)), {"product_ids": list(product_ids)})
+            return [
+                {'id': row.id, 'sku': row.sku, 'title': row.title, 'data_points': row.data_points}
+                for row in rows
+            ]
+    
+    def _cost_model(self, units: List[Tuple[Optional[str], List[Dict[str, Any]]]]) -> CostModel:
+        """Cost model from the units' data point counts and recorded training durations."""
+        products = [product for _, members in units for product in members]
+        try:
+            durations = self.run_registry.historical_durations([product['id'] for product in products])
+        except Exception as e:
+            logger.warning(f"Error loading training durations, scheduling by data points only: {e}")
+            durations = {}
+        
+        model = CostModel(durations, {product['id']: product.get('data_points') or 0 for product in products})
+        logger.info(f"Cost model: {model.base:.2f}s + {model.per_point * 1000:.3f}s per 1000 points "
+                    f"({len(durations)}/{len(products)} products with recorded durations)")
+        return model
+    
+    def _plan_units(
+        self,
+        products: List[Dict[str, Any]],
+        results: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Optional[str], List[Dict[str, Any]]]]:
+        """Fit units: products sharing a group are fitted together, the rest alone."""
+        if not self.training_config.grouped_training:
+            return [(None, [product]) for product in products]
+        
+        groups, singles = build_groups(
+            products,
+            self.training_config.group_prefix_words,
+            max(2, self.training_config.min_group_size)
+        )
+        if results is not None:
+            results['groups'] = len(groups)
+        logger.info(f"Grouped training: {len(groups)} groups, {len(singles)} products trained individually")
+        return [(key, members) for key, members in groups.items()] + [(None, [product]) for product in singles]
+    
+    def enqueue_distributed_run(self, run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue every product that needs training as leasable batches for distributed workers.
+        
+        Batches hold whole fit units, so a product group is always trained by one worker.
+        They are balanced by predicted cost, and the most expensive batches get the
+        highest claim priority so no large batch is left for the end of the run.
+        
+        Returns:
+            Dict with the run ID and the number of batches and products queued
+        """
+        run_id = run_id or new_run_id()
+        products = [product for product in self.get_products_for_training() if product['needs_retrain']]
+        units = self._plan_units(products)
+        
+        balanced = balance_batches(units, self._cost_model(units), self.distributed_config.batch_size)
+        batches = [
+            [{'group': group, 'product_ids': [product['id'] for product in members]} for group, members in batch]
+            for batch, _ in balanced
+        ]
+        # Most expensive first: claims are ordered by priority DESC
+        priorities = list(range(len(batches), 0, -1))
+        
+        # The run row must exist before any lease is claimable, or early workers record items for no run
+        self.run_registry.start_run(run_id, [product['id'] for product in products], mode='distributed')
+        LeaseQueue(self.engine, self.distributed_config).enqueue(run_id, batches, priorities)
+        logger.info(f"Enqueued run {run_id}: {len(products)} products in {len(batches)} batches")
+        return {'run_id': run_id, 'batches': len(batches), 'products': len(products)}
+    
+    def work_distributed_run(
+        self,
+        run_id: str,
+        worker_id: Optional[str] = None,
+        max_batches: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Claim and train batches of a distributed run until none are left.
+        
+        Any number of workers, on one node or many, can run this against the same
+        database; each batch is trained through the normal pipeline while a
+        heartbeat keeps its lease alive. If the lease is lost (it expired and was
+        reclaimed), the batch is abandoned between products and left to its new owner.
+        
+        Returns:
+            Totals for the batches this worker trained
+        """
+        worker_id = worker_id or default_worker_id()
+        lease_queue = LeaseQueue(self.engine, self.distributed_config)
+        totals = {'worker_id': worker_id, 'batches': 0, 'successful': 0, 'failed': 0, 'lost_leases': 0}
+        
+        while max_batches is None or totals['batches'] < max_batches:
+            lease = lease_queue.claim(run_id, worker_id)
+            if lease is None:
+                break
+            
+            logger.info(f"Worker {worker_id} claimed batch {lease.batch_index} of {run_id} (attempt {lease.attempts})")
+            results = {'successful': 0, 'failed': 0, 'errors': []}
+            try:
+                units = self._load_lease_units(lease)
+                tasks = schedule_tasks(units, self._cost_model(units), self.training_config.pack_target_seconds)
+                with LeaseHeartbeat(lease_queue, lease, worker_id) as heartbeat:
+                    self._run_training_pipeline(
+                        tasks, results, run_id=run_id, should_stop=lambda: heartbeat.lost,
+                        model_version=run_model_version(run_id)
+                    )
+                if heartbeat.lost:
+                    totals['lost_leases'] += 1
+                    logger.warning(f"Abandoned batch {lease.batch_index} of {run_id}: lease was lost")
+                    continue
             except Exception as e:
+                error_msg = f"Error training batch {lease.batch_index}: {e}"
+                logger.error(error_msg)
+                results['failed'] = sum(len(unit['product_ids']) for unit in lease.units) - results['successful']
+                results['errors'].append(error_msg)
+            
+            totals['batches'] += 1
+            totals['successful'] += results['successful']
+            totals['failed'] += results['failed']
+            if not lease_queue.complete(lease, worker_id, results):
+                totals['lost_leases'] += 1
+                logger.warning(f"Batch {lease.batch_index} of {run_id} was reclaimed before it finished")
+            self._finish_distributed_run(run_id, lease_queue)
+        
+        # Also covers runs whose last batches were abandoned after max_attempts
+        self._finish_distributed_run(run_id, lease_queue)
+        logger.info(f"Worker {worker_id} finished: {totals['batches']} batches, "
+                    f"{totals['successful']} successful, {totals['failed']} failed")
+        return totals
+    
+    def _finish_distributed_run(self, run_id: str, lease_queue: LeaseQueue) -> None:
+        """Close the run in the registry once none of its batches can still be trained."""
+        try:
+            if lease_queue.outstanding(run_id) == 0:
+                totals = self.run_registry.finish_run(run_id)
+                logger.info(f"Run {run_id} finished: {totals['successful']} successful, {totals['failed']} failed")
+        except Exception as e:
+            logger.warning(f"Error finishing run {run_id}: {e}")
+    
+    def _load_lease_units(self, lease) -> List[Tuple[Optional[str], List[Dict[str, Any]]]]:
+        """Rebuild a lease's fit units with the product rows the pipeline expects."""
+        product_ids = [pid for unit in lease.units for pid in unit['product_ids']]
+        products = {product['id']: product for product in self._get_products(product_ids)}
+        
+        return [
+            (unit['group'], [products[pid] for pid in unit['product_ids'] if pid in products])
+            for unit in lease.units
+        ]
+    
+    def distributed_run_report(self, run_id: str) -> Dict[str, Any]:
+        """Aggregated results and errors of every batch in a distributed run."""
+        lease_queue = LeaseQueue(self.engine, self.distributed_config)
+        report = lease_queue.report(run_id)
+        if report['complete']:
+            self._finish_distributed_run(run_id, lease_queue)
+        return report
+    
+    def _run_training_pipeline(
+        self,
+        tasks: List[List[Tuple[Optional[str], List[Dict[str, Any]]]]],
+        results: Dict[str, Any],
+        tuned: Optional[Dict[int, Dict[str, Any]]] = None,
+        run_id: Optional[str] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        model_version: Optional[str] = None
+    ) -> None:
+        """
+        Train products through a prefetch -> fit -> write pipeline.
+        
+        The stages run on their own threads and are connected by bounded queues, so
+        history reads and forecast writes overlap with model fitting. A full queue
+        blocks the stage feeding it, which keeps memory bounded when one stage is slower.
+        
+        Each task is a list of fit units that one fit worker handles in a row (see
+        ``schedule_tasks``); tasks are started in the given order. Each unit is
+        ``(group key, products)``; a unit with a group key is fitted with shared
+        seasonality, otherwise its single product is fitted on its own, with
+        parameters from ``tuned`` or else those stored by an earlier tuning run.
+        
+        With ``run_id`` every product's outcome, duration (its share of the fit plus
+        its write) and error are recorded in the run registry as they happen.
+        
+        Once ``should_stop`` returns True, the remaining units are neither fitted nor
+        written, and their outcome is left unrecorded.
+        
+        Every unit is stored under ``model_version`` (a timestamp version per unit
+        when not given).
+        """
+        tuned = tuned or {}
+        should_stop = should_stop or (lambda: False)
+        queue_size = max(1, self.training_config.pipeline_queue_size)
+        fit_workers = max(1, self.training_config.fit_workers)
+        fit_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        results_lock = threading.Lock()
+        empty_history = pd.DataFrame({'ds': pd.Series(dtype='datetime64[ns]'), 'y': pd.Series(dtype='float32')})
+        
+        def record_item(
+            product: Dict[str, Any],
+            status: str,
+            model_version: Optional[str],
+            duration: Optional[float],
+            error: Optional[str] = None
+        ) -> None:
+            if run_id is None:
+                return
+            try:
+                self.run_registry.record_item(
+                    run_id, product['id'], status, model_version,
+                    round(duration, 3) if duration is not None else None, error
+                )
+            except Exception as e:
+                logger.warning(f"Error recording run item for product {product['id']}: {e}")
+        
+        def record_failure(
+            product: Dict[str, Any],
+            error_msg: str,
+            model_version: Optional[str] = None,
+            duration: Optional[float] = None
+        ) -> None:
+            with results_lock:
                 results['failed'] += 1
-                error_msg = f"Error training product {product['id']} ({product['sku']}): {e}"
                 results['errors'].append(error_msg)
-                logger.error(error_msg)
+            record_item(product, 'failed', model_version, duration, error_msg)
         
-        logger.info(f"Training completed: {results['successful']} successful, {results['failed']} failed, {results['skipped']} skipped")
-        return results
+        def prefetch_stage() -> None:
+            batch_size = max(1, self.training_config.fetch_batch_size)
+            
+            def emit(block: List[List[Tuple[Optional[str], List[Dict[str, Any]]]]]) -> None:
+                product_ids = [p['id'] for task in block for _, members in task for p in members]
+                history = self._get_training_data_batch(product_ids)
+                params = {**self._load_tuned_params([pid for pid in product_ids if pid not in tuned]), **tuned}
+                for task in block:
+                    fit_queue.put([
+                        (group, members, {p['id']: history.get(p['id'], empty_history) for p in members}, params)
+                        for group, members in task
+                    ])
+            
+            try:
+                # Whole tasks per block, so a group's histories arrive together
+                block, block_products = [], 0
+                for task in tasks:
+                    if should_stop():
+                        break
+                    block.append(task)
+                    block_products += sum(len(members) for _, members in task)
+                    if block_products >= batch_size:
+                        emit(block)
+                        block, block_products = [], 0
+                if block and not should_stop():
+                    emit(block)
+            finally:
+                for _ in range(fit_workers):
+                    fit_queue.put(None)
+        
+        def fit_unit(
+            group: Optional[str],
+            members: List[Dict[str, Any]],
+            histories: Dict[int, pd.DataFrame],
+            params: Dict[int, Dict[str, Any]]
+        ) -> None:
+            unit_version = model_version or f"prophet_v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            started = time.perf_counter()
+            if group is None:
+                product = members[0]
+                logger.info(f"Training Prophet model for product {product['id']} (version: {unit_version})")
+                fitted = {product['id']: self._fit_product_model(
+                    product['id'], unit_version, histories[product['id']], params.get(product['id'])
+                )}
+            else:
+                logger.info(f"Training product group '{group}' (version: {unit_version})")
+                fitted = self._fit_product_group(group, members, histories)
+            
+            # A group's fit time is shared evenly by its members
+            fit_seconds = (time.perf_counter() - started) / len(members)
+            for product in members:
+                result = fitted.get(product['id'])
+                if result is None:
+                    record_failure(
+                        product, f"Failed to train product {product['id']} ({product['sku']})",
+                        unit_version, fit_seconds
+                    )
+                else:
+                    write_queue.put((product, unit_version, result, histories[product['id']], fit_seconds))
+        
+        def fit_stage() -> None:
+            while True:
+                task = fit_queue.get()
+                if task is None:
+                    write_queue.put(None)
+                    return
+                
+                for group, members, histories, params in task:
+                    if should_stop():
+                        break
+                    try:
+                        fit_unit(group, members, histories, params)
+                    except Exception as e:
+                        for product in members:
+                            error_msg = f"Error training product {product['id']} ({product['sku']}): {e}"
+                            logger.error(error_msg)
+                            record_failure(product, error_msg)
+        
+        def write_stage() -> None:
+            finished_fitters = 0
+            while finished_fitters < fit_workers:
+                item = write_queue.get()
+                if item is None:
+                    finished_fitters += 1
+                    continue
+                
+                product, model_version, fitted, training_data, fit_seconds = item
+                if should_stop():
+                    continue
+                started = time.perf_counter()
+                success = self._store_training_results(product['id'], model_version, fitted, training_data)
+                duration = fit_seconds + time.perf_counter() - started
+                if success:
+                    logger.info(f"✅ Successfully trained model for product {product['id']}")
+                    with results_lock:
+                        results['successful'] += 1
+                    record_item(product, 'succeeded', model_version, duration)
+                else:
+                    logger.error(f"❌ Failed to store training results for product {product['id']}")
+                    record_failure(
+                        product, f"Failed to train product {product['id']} ({product['sku']})",
+                        model_version, duration
+                    )
+        
+        stages = [threading.Thread(target=prefetch_stage, name="train-prefetch")]
+        stages += [threading.Thread(target=fit_stage, name=f"train-fit-{i}") for i in range(fit_workers)]
+        stages.append(threading.Thread(target=write_stage, name="train-writer"))
+        
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+def _work_process(config_path: str, run_id: str, worker_id: Optional[str]) -> None:
+    """Entry point of a local --work process."""
+    ProphetTrainingJob(config_path).work_distributed_run(run_id, worker_id)
+
+def _print_run_report(report: Dict[str, Any]) -> None:
+    print(f"Run {report['run_id']}:")
+    print(f"  Batches: {report['batches']} ({report['pending']} pending, {report['leased']} leased, "
+          f"{report['expired_leases']} expired, {report['abandoned_batches']} abandoned)")
+    print(f"  Products: {report['total_products']}")
+    print(f"  Successful: {report['successful']}")
+    print(f"  Failed: {report['failed']}")
+    print(f"  Workers: {', '.join(report['workers']) or '-'}")
+    print(f"  Complete: {report['complete']}")
+    if report['errors']:
+        print("\nErrors:")
+        for error in report['errors']:
+            print(f"  - {error}")
 
 def main():
     """Main function for command-line usage."""
@@ -344,30 +988,85 @@ def main():
     parser.add_argument('--product-id', type=int, help='Train model for specific product ID')
     parser.add_argument('--all', action='store_true', help='Train models for all products')
     parser.add_argument('--config', default='config/settings.toml', help='Configuration file path')
-    parser.add_argument('--model-version', help='Custom model version string')
+    parser.add_argument('--model-version', help='Custom model version string (--all defaults to one derived from the run ID)')
+    parser.add_argument('--tune', action='store_true', help='Search hyperparameters before training (see [tuning])')
+    parser.add_argument('--measure-overhead', action='store_true', help='Benchmark per-fit Stan overhead with the [stan] settings')
+    parser.add_argument('--enqueue', action='store_true', help='Queue products needing training as a distributed run')
+    parser.add_argument('--work', action='store_true', help='Claim and train batches of a distributed run (needs --run-id)')
+    parser.add_argument('--report', action='store_true', help='Show the aggregated report of a distributed run (needs --run-id)')
+    parser.add_argument('--run-id', help='Distributed run ID (defaults to a new one for --enqueue)')
+    parser.add_argument('--resume', metavar='RUN_ID', help='Resume a training run, skipping products it already trained')
+    parser.add_argument('--worker-id', help='Worker ID for --work (defaults to host:pid)')
+    parser.add_argument('--processes', type=int, default=1, help='Local worker processes for --work')
     
     args = parser.parse_args()
     
     # Initialize job
     job = ProphetTrainingJob(args.config)
     
-    if args.product_id:
+    if args.measure_overhead:
+        # Fixed per-fit cost, stock Prophet vs the managed backend
+        overhead = job.measure_fit_overhead()
+        print("Per-fit overhead:")
+        for key, value in overhead.items():
+            print(f"  {key}: {value}")
+    
+    elif args.enqueue:
+        # Queue a distributed run; workers on any node then use --work --run-id
+        queued = job.enqueue_distributed_run(args.run_id)
+        print(f"✅ Enqueued {queued['products']} products in {queued['batches']} batches")
+        print(f"  Run ID: {queued['run_id']}")
+    
+    elif args.work:
+        if not args.run_id:
+            parser.error('--work requires --run-id')
+        if args.processes > 1:
+            # Several workers on this node, each with its own job and connections
+            import multiprocessing
+            workers = [
+                multiprocessing.Process(target=_work_process, args=(args.config, args.run_id, None))
+                for _ in range(args.processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        else:
+            totals = job.work_distributed_run(args.run_id, args.worker_id)
+            print(f"Worker {totals['worker_id']}: {totals['batches']} batches, "
+                  f"{totals['successful']} successful, {totals['failed']} failed")
+        _print_run_report(job.distributed_run_report(args.run_id))
+    
+    elif args.report:
+        if not args.run_id:
+            parser.error('--report requires --run-id')
+        _print_run_report(job.distributed_run_report(args.run_id))
+    
+    elif args.product_id:
         # Train specific product
-        success = job.train_product_model(args.product_id, args.model_version)
+        success = job.train_product_model(args.product_id, args.model_version, tune=args.tune)
         if success:
             print(f"✅ Successfully trained model for product {args.product_id}")
         else:
             print(f"❌ Failed to train model for product {args.product_id}")
             exit(1)
     
-    elif args.all:
-        # Train all products
-        results = job.train_all_products()
+    elif args.all or args.resume:
+        # Train all products (or what is left of an earlier run)
+        results = job.train_all_products(
+            tune=args.tune, resume_run_id=args.resume, model_version=args.model_version
+        )
         print("Training Results:")
+        print(f"  Run ID: {results['run_id']}")
         print(f"  Total products: {results['total_products']}")
         print(f"  Successful: {results['successful']}")
         print(f"  Failed: {results['failed']}")
         print(f"  Skipped: {results['skipped']}")
+        if 'tuned' in results:
+            print(f"  Tuned: {results['tuned']}")
+        print(f"  Elapsed: {results['elapsed_seconds']}s ({results['products_per_second']} products/s)")
+        print(f"  Fits: {results['fit_stats']['fits']} ({results['fit_stats']['fit_seconds_mean']}s mean, "
+              f"{results['fit_stats']['backend_loads']} backend loads in {results['fit_stats']['backend_load_seconds']}s)")
         
         if results['errors']:
             print("\nErrors:")
@@ -375,7 +1074,7 @@ def main():
                 print(f"  - {error}")
     
     else:
-        print("Please specify --product-id or --all")
+        print("Please specify --product-id, --all, --resume, --enqueue, --work, --report or --measure-overhead")
         parser.print_help()
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+PriceScout Hyperparameter Tuning
+Per-product Prophet parameter search with successive halving on a process pool
+"""
+
+import itertools
+import logging
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic_settings import BaseSettings
+
+from jobs.stan_backend import StanConfig, configure_stan, make_prophet
+
+logger = logging.getLogger(__name__)
+
+
+class TuningConfig(BaseSettings):
+    changepoint_prior_scale: List[float] = [0.001, 0.01, 0.05, 0.1, 0.5]
+    seasonality_prior_scale: List[float] = [0.1, 1.0, 10.0]
+    seasonality_mode: List[str] = ["additive", "multiplicative"]
+    holdout_days: int = 30
+    min_train_points: int = 60
+    halving_factor: int = 3
+    workers: int = 0  # 0 = one per CPU
+    time_budget_seconds: float = 600.0
+
+
+def _score_candidate(history: pd.DataFrame, params: Dict[str, Any], train_points: int, holdout_days: int) -> float:
+    """
+    Holdout MAPE of one parameter set (runs in a worker process).
+
+    The model is fitted on the ``train_points`` observations just before the
+    holdout, i.e. on the most recent slice of the training history.
+    """
+    train = history.iloc[:-holdout_days].iloc[-train_points:]
+    holdout = history.iloc[-holdout_days:]
+
+    model = make_prophet(**params)
+    model.fit(train[['ds', 'y']])
+    predicted = model.predict(holdout[['ds']])['yhat'].to_numpy()
+    actual = holdout['y'].to_numpy(dtype='float64')
+    return float(np.mean(np.abs(predicted - actual) / np.abs(actual)))
+
+
+class HyperparameterTuner:
+    """
+    Successive-halving search over a small Prophet grid, for many products at once.
+
+    Every product starts with the full grid fitted on a short recent window. After
+    each rung only the best 1/``halving_factor`` candidates survive and the window
+    grows by the same factor; the last rung scores the survivors on the full
+    history. All fits share one process pool. Once the time budget runs out,
+    queued fits are cancelled (fits already running finish) and each product keeps
+    the best candidate from the highest rung it completed.
+    """
+
+    def __init__(self, config: TuningConfig, base_params: Dict[str, Any], stan_config: Optional[StanConfig] = None):
+        self.config = config
+        self.base_params = base_params
+        self.stan_config = stan_config or StanConfig()
+
+    def candidates(self) -> List[Dict[str, Any]]:
+        grid = itertools.product(
+            self.config.changepoint_prior_scale,
+            self.config.seasonality_prior_scale,
+            self.config.seasonality_mode
+        )
+        return [
+            {
+                **self.base_params,
+                'changepoint_prior_scale': cps,
+                'seasonality_prior_scale': sps,
+                'seasonality_mode': mode
+            }
+            for cps, sps, mode in grid
+        ]
+
+    def tune(self, histories: Dict[int, pd.DataFrame]) -> Dict[int, Dict[str, Any]]:
+        """
+        Search parameters for each product.
+
+        Args:
+            histories: ds/y history per product (products too short to hold out are skipped)
+
+        Returns:
+            Dict mapping product ID to {'params', 'holdout_mape', 'rung', 'evaluated'}
+        """
+        holdout = self.config.holdout_days
+        eligible = {
+            product_id: history.reset_index(drop=True)
+            for product_id, history in histories.items()
+            if len(history) >= holdout + self.config.min_train_points
+        }
+        if not eligible:
+            return {}
+
+        candidates = self.candidates()
+        eta = max(2, self.config.halving_factor)
+        # Enough rungs that the last one (full window) still compares around eta candidates
+        n_rungs = max(1, math.floor(math.log(len(candidates), eta) + 1e-9))
+        deadline = time.monotonic() + self.config.time_budget_seconds
+        workers = self.config.workers or os.cpu_count() or 1
+
+        survivors = {product_id: list(range(len(candidates))) for product_id in eligible}
+        best: Dict[int, Tuple[int, float, int]] = {}  # product -> (rung, score, candidate)
+        evaluated = {product_id: 0 for product_id in eligible}
+
+        logger.info(f"Tuning {len(eligible)} products over {len(candidates)} candidates "
+                    f"({n_rungs} rungs, {workers} workers, {self.config.time_budget_seconds}s budget)")
+
+        # Each worker applies the Stan settings once and then reuses its backend
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_stan, initargs=(self.stan_config,)) as pool:
+            for rung in range(n_rungs):
+                scores = self._run_rung(pool, rung, n_rungs, eta, eligible, survivors, candidates, deadline)
+
+                for product_id, product_scores in scores.items():
+                    evaluated[product_id] += len(product_scores)
+                    ranked = sorted(product_scores.items(), key=lambda item: item[1])
+                    best[product_id] = (rung, ranked[0][1], ranked[0][0])
+                    survivors[product_id] = [index for index, _ in ranked[:max(1, len(ranked) // eta)]]
+
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Tuning time budget exhausted after rung {rung + 1}/{n_rungs}")
+                    break
+
+        return {
+            product_id: {
+                'params': candidates[index],
+                'holdout_mape': score,
+                'rung': rung,
+                'evaluated': evaluated[product_id]
+            }
+            for product_id, (rung, score, index) in best.items()
+        }
+
+    def _run_rung(
+        self,
+        pool: ProcessPoolExecutor,
+        rung: int,
+        n_rungs: int,
+        eta: int,
+        histories: Dict[int, pd.DataFrame],
+        survivors: Dict[int, List[int]],
+        candidates: List[Dict[str, Any]],
+        deadline: float
+    ) -> Dict[int, Dict[int, float]]:
+        """Score every surviving candidate of every product; returns only completed scores."""
+        futures = {}
+        for product_id, history in histories.items():
+            available = len(history) - self.config.holdout_days
+            # The window shrinks by eta for every rung below the last
+            train_points = max(self.config.min_train_points, available // eta ** (n_rungs - 1 - rung))
+            train_points = min(train_points, available)
+            for index in survivors[product_id]:
+                future = pool.submit(
+                    _score_candidate, history, candidates[index], train_points, self.config.holdout_days
+                )
+                futures[future] = (product_id, index)
+
+        scores: Dict[int, Dict[int, float]] = {}
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                product_id, index = futures[future]
+                try:
+                    score = future.result()
+                except Exception as e:
+                    logger.warning(f"Tuning fit failed for product {product_id}: {e}")
+                    continue
+                if np.isfinite(score):
+                    scores.setdefault(product_id, {})[index] = score
+
+        for future in pending:
+            future.cancel()
+
+        # A product only advances if its whole rung finished, so rungs stay comparable
+        unfinished = {futures[future][0] for future in pending}
+        return {
+            product_id: product_scores
+            for product_id, product_scores in scores.items()
+            if product_id not in unfinished
+        }
+
+
+def tuned_model_params(result: Dict[str, Any]) -> Dict[str, Any]:
+    """model_params entry for a tuning result; the ``tuned`` flag lets retrains reuse it."""
+    return {
+        **result['params'],
+        'tuned': True,
+        'tuning': {
+            'holdout_mape': result['holdout_mape'],
+            'rung': result['rung'],
+            'evaluated': result['evaluated']
+        }
+    }
+
+
+def load_tuned_params(model_params: Optional[Any]) -> Optional[Dict[str, Any]]:
+    """Parse stored model_params, returning them only if they came from tuning."""
+    if model_params is None:
+        return None
+    if isinstance(model_params, (str, bytes)):
+        import json
+        model_params = json.loads(model_params)
+    return model_params if model_params.get('tuned') else None
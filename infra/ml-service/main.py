@@ -5,13 +5,27 @@ Main entry point for the ML service with Flask API
 """
 
 import os
+import json
+import hashlib
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Dict, Any, List
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from jobs.ingest_dataset import DataIngestionJob
 from jobs.train_prophet import ProphetTrainingJob
+from jobs.model_store import ArtifactConfig, ModelArtifactStore, get_model_cache
+from forecast_formats import (
+    FORMAT_MIME_TYPES,
+    UnsupportedFormat,
+    compress_response,
+    encode_arrow,
+    encode_msgpack,
+    forecast_columns,
+    jsonable_columns,
+    ndjson_line,
+    negotiate_format
+)
 
 # Configure logging
 logging.basicConfig(
@@ -33,26 +47,41 @@ def health_check():
 
 @app.route('/ingest/s3', methods=['POST'])
 def ingest_from_s3():
-    """Ingest data from S3."""
+    """Ingest data from S3 (a single key, a key prefix, or a manifest of keys)."""
     try:
         data = request.get_json()
         s3_key = data.get('s3_key')
+        s3_prefix = data.get('s3_prefix')
+        s3_keys = data.get('s3_keys')
         
-        if not s3_key:
-            return jsonify({'error': 's3_key is required'}), 400
+        if not (s3_key or s3_prefix or s3_keys):
+            return jsonify({'error': 's3_key, s3_prefix or s3_keys is required'}), 400
         
         job = DataIngestionJob()
-        success = job.ingest_from_s3(s3_key)
+        
+        if s3_prefix or s3_keys:
+            report = job.ingest_from_s3_objects(prefix=s3_prefix, keys=s3_keys)
+            status_code = 200 if report['success'] else 500
+            return jsonify({
+                'status': 'success' if report['success'] else 'partial',
+                'report': report,
+                'rejects': job.reject_report,
+                'stats': job.get_ingestion_stats()
+            }), status_code
+        
+        success = job.ingest_from_s3(s3_key, data.get('start_date'), data.get('end_date'))
         
         if success:
             stats = job.get_ingestion_stats()
             return jsonify({
                 'status': 'success',
                 'message': f'Successfully ingested data from s3://{job.aws_config.s3_bucket}/{s3_key}',
-                'stats': stats
+                'stats': stats,
+                'report': job.last_load_report,
+                'rejects': job.reject_report
             })
         else:
-            return jsonify({'error': 'Failed to ingest data from S3'}), 500
+            return jsonify({'error': 'Failed to ingest data from S3', 'report': job.last_load_report}), 500
             
     except Exception as e:
         logger.error(f"Error in S3 ingestion: {e}")
@@ -76,10 +105,12 @@ def ingest_from_local():
             return jsonify({
                 'status': 'success',
                 'message': f'Successfully ingested data from {file_path}',
-                'stats': stats
+                'stats': stats,
+                'report': job.last_load_report,
+                'rejects': job.reject_report
             })
         else:
-            return jsonify({'error': 'Failed to ingest data from local file'}), 500
+            return jsonify({'error': 'Failed to ingest data from local file', 'report': job.last_load_report}), 500
             
     except Exception as e:
         logger.error(f"Error in local ingestion: {e}")
@@ -111,10 +142,13 @@ def train_product_model(product_id: int):
 
 @app.route('/train/all', methods=['POST'])
 def train_all_products():
-    """Train models for all products."""
+    """Train models for all products (``resume_run_id`` continues an earlier run, ``model_version`` overrides the run's version)."""
     try:
+        data = request.get_json(silent=True) or {}
         job = ProphetTrainingJob()
-        results = job.train_all_products()
+        results = job.train_all_products(
+            resume_run_id=data.get('resume_run_id'), model_version=data.get('model_version')
+        )
         
         return jsonify({
             'status': 'success',
@@ -126,60 +160,407 @@ def train_all_products():
         logger.error(f"Error training all products: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Forecast window bounds for /predict
+DEFAULT_PREDICTION_DAYS = 30
+MAX_PREDICTION_DAYS = 3650
+MAX_BATCH_PRODUCTS = 500
+
+_engine = None
+_artifact_store = None
+
+def _load_settings() -> Dict[str, Any]:
+    import toml
+    
+    with open('config/settings.toml', 'r') as f:
+        return toml.load(f)
+
+def get_engine():
+    """Shared SQLAlchemy engine for request handlers (created on first use)."""
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        from jobs.train_prophet import DatabaseConfig
+        
+        db_config = DatabaseConfig(**_load_settings()["database"])
+        _engine = create_engine(db_config.url, pool_pre_ping=True)
+    return _engine
+
+def get_artifact_store() -> ModelArtifactStore:
+    """Shared model artifact store for on-demand prediction (created on first use)."""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ModelArtifactStore(ArtifactConfig(**_load_settings().get("artifacts", {})))
+    return _artifact_store
+
+def _parse_prediction_window(args) -> Dict[str, Any]:
+    """
+    Read days/from/to/format query parameters.
+    
+    ``from`` defaults to today. ``to`` wins over ``days`` when both are given.
+    Raises ValueError (or UnsupportedFormat) on malformed input.
+    """
+    start = date.fromisoformat(args['from']) if args.get('from') else date.today()
+    
+    if args.get('to'):
+        end = date.fromisoformat(args['to'])
+    else:
+        days = int(args.get('days', DEFAULT_PREDICTION_DAYS))
+        if days < 1:
+            raise ValueError('days must be positive')
+        end = start + timedelta(days=days - 1)
+    
+    if end < start:
+        raise ValueError('to must not be before from')
+    if (end - start).days + 1 > MAX_PREDICTION_DAYS:
+        raise ValueError(f'At most {MAX_PREDICTION_DAYS} days can be requested')
+    
+    fmt = negotiate_format(args.get('format'), request.accept_mimetypes)
+    return {'from': start, 'to': end, 'format': fmt}
+
+def _active_model_versions(conn, product_ids: List[int]) -> Dict[int, str]:
+    """Active model version per product (products without model metadata are omitted)."""
+    from sqlalchemy import text, bindparam
+    
+    rows = conn.execute(text("""
+        SELECT product_id, model_version
+        FROM model_metadata
+        WHERE product_id IN :product_ids AND is_active = 1
+        ORDER BY created_at
+    """).bindparams(bindparam("product_ids", expanding=True)), {"product_ids": product_ids})
+    # Latest created_at wins if more than one row is flagged active
+    return {row.product_id: row.model_version for row in rows}
+
+ACTIVE_VERSION_JOIN = """
+    JOIN model_metadata mm
+        ON mm.product_id = f.product_id AND mm.model_version = f.model_version AND mm.is_active = 1
+"""
+
+def _forecast_query(versioned: bool):
+    """Forecast rows for a set of products, restricted to their active versions when ``versioned``."""
+    from sqlalchemy import text, bindparam
+    
+    version_join = ACTIVE_VERSION_JOIN if versioned else ""
+    return text(f"""
+        SELECT f.product_id, f.ds, f.yhat, f.yhat_lower, f.yhat_upper, f.model_version
+        FROM forecasts f
+        {version_join}
+        WHERE f.product_id IN :product_ids
+        AND f.ds BETWEEN :start AND :end
+        ORDER BY f.product_id, f.ds
+    """).bindparams(bindparam("product_ids", expanding=True))
+
+def _forecast_content_tokens(conn, product_ids: List[int], window: Dict[str, Any], versioned: bool) -> Dict[int, str]:
+    """
+    Token per product that changes whenever the forecast rows it serves change.
+    
+    A rerun of the same model version rewrites rows without changing the version,
+    so versions alone cannot validate a cached response. Active versions written
+    with chunk hashes (see jobs/forecast_writer.py) are summarized from those;
+    anything else (rows from before chunk hashing, products without model
+    metadata) from a checksum of the requested rows themselves.
+    """
+    from sqlalchemy import text, bindparam
+    
+    tokens = {}
+    if versioned:
+        rows = conn.execute(text("""
+            SELECT f.product_id, COUNT(*) as chunks, MAX(f.updated_at) as updated_at,
+                   BIT_XOR(CONV(LEFT(f.content_hash, 15), 16, 10)) as digest
+            FROM forecast_chunk_hashes f
+            """ + ACTIVE_VERSION_JOIN + """
+            WHERE f.product_id IN :product_ids
+            GROUP BY f.product_id
+        """).bindparams(bindparam("product_ids", expanding=True)), {"product_ids": product_ids})
+        tokens = {row.product_id: f"{row.chunks}/{row.updated_at}/{row.digest}" for row in rows}
+    
+    unhashed = [pid for pid in product_ids if pid not in tokens]
+    if unhashed:
+        version_join = ACTIVE_VERSION_JOIN if versioned else ""
+        rows = conn.execute(text(f"""
+            SELECT f.product_id, COUNT(*) as n,
+                   BIT_XOR(CRC32(CONCAT_WS(',', f.ds, f.yhat, f.yhat_lower, f.yhat_upper, f.model_version))) as digest
+            FROM forecasts f
+            {version_join}
+            WHERE f.product_id IN :product_ids
+            AND f.ds BETWEEN :start AND :end
+            GROUP BY f.product_id
+        """).bindparams(bindparam("product_ids", expanding=True)),
+            {"product_ids": unhashed, "start": window['from'], "end": window['to']})
+        tokens.update({row.product_id: f"rows/{row.n}/{row.digest}" for row in rows})
+    return tokens
+
+def _prediction_etag(product_versions: Dict[int, Any], tokens: Dict[int, str], window: Dict[str, Any]) -> str:
+    versions = ",".join(
+        f"{pid}={version}@{tokens.get(pid)}" for pid, version in sorted(product_versions.items())
+    )
+    key = f"{versions}:{window['from']}:{window['to']}:{window['format']}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _forecast_response(product_ids: List[int], window: Dict[str, Any], single: bool):
+    """
+    Build a forecast response for one or more products in the negotiated format.
+    
+    The ETag is weak so it stays valid across gzip/brotli encodings of the same body.
+    """
+    engine = get_engine()
+    with engine.connect() as conn:
+        versions = _active_model_versions(conn, product_ids)
+        # A single product without model metadata still gets its (unversioned) forecasts
+        versioned = not single or bool(versions)
+        tokens = _forecast_content_tokens(conn, product_ids, window, versioned)
+    
+    product_versions = {pid: versions.get(pid) for pid in product_ids}
+    etag = _prediction_etag(product_versions, tokens, window)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    params = {"product_ids": product_ids, "start": window['from'], "end": window['to']}
+    query = _forecast_query(versioned)
+    fmt = window['format']
+    
+    if fmt == 'ndjson':
+        def generate():
+            # Server-side cursor so long horizons are never materialized in memory
+            with engine.connect().execution_options(stream_results=True) as conn:
+                for row in conn.execute(query, params):
+                    record = {
+                        'date': str(row.ds),
+                        'predicted_price': float(row.yhat),
+                        'lower_bound': float(row.yhat_lower),
+                        'upper_bound': float(row.yhat_upper),
+                        'model_version': row.model_version
+                    }
+                    if not single:
+                        record = {'product_id': row.product_id, **record}
+                    yield ndjson_line(record)
+        
+        response = Response(stream_with_context(generate()), mimetype=FORMAT_MIME_TYPES['ndjson'])
+        response.set_etag(etag, weak=True)
+        return response
+    
+    with engine.connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+    
+    if fmt == 'json':
+        predictions = [
+            {
+                'date': str(row.ds),
+                'predicted_price': float(row.yhat),
+                'lower_bound': float(row.yhat_lower),
+                'upper_bound': float(row.yhat_upper),
+                'model_version': row.model_version
+            }
+            for row in rows
+        ]
+        if single:
+            payload = {'status': 'success', 'product_id': product_ids[0], 'predictions': predictions}
+        else:
+            by_product = {pid: [] for pid in product_ids}
+            for row, prediction in zip(rows, predictions):
+                by_product[row.product_id].append(prediction)
+            payload = {
+                'status': 'success',
+                'products': [{'product_id': pid, 'predictions': by_product[pid]} for pid in product_ids]
+            }
+        response = jsonify(payload)
+    
+    else:
+        columns = forecast_columns(rows, with_product_id=not single)
+        if single:
+            model_version = versions.get(product_ids[0]) or (rows[0].model_version if rows else None)
+            meta = {'product_id': product_ids[0], 'model_version': model_version}
+        else:
+            meta = {'model_versions': {str(pid): version for pid, version in product_versions.items()}}
+        
+        if fmt == 'arrow':
+            body = encode_arrow(columns, {key: json.dumps(value) for key, value in meta.items()})
+            response = Response(body, mimetype=FORMAT_MIME_TYPES['arrow'])
+        else:
+            payload = {'status': 'success', **meta, 'count': len(rows), 'columns': jsonable_columns(columns)}
+            if fmt == 'msgpack':
+                response = Response(encode_msgpack(payload), mimetype=FORMAT_MIME_TYPES['msgpack'])
+            else:
+                response = jsonify(payload)
+    
+    response.set_etag(etag, weak=True)
+    return response
+
 @app.route('/predict/<int:product_id>', methods=['GET'])
 def get_predictions(product_id: int):
-    """Get price predictions for a product."""
+    """
+    Get price predictions for a product.
+    
+    Query parameters:
+        days: Number of days from ``from`` (default 30)
+        from / to: Inclusive ISO date range (``from`` defaults to today)
+        format: ``json`` (row objects), ``columns`` (one array per field),
+            ``ndjson`` (streamed, one row per line), ``msgpack`` or ``arrow``
+            (Arrow IPC stream); otherwise chosen from the Accept header
+    
+    Responses carry a weak ETag derived from the active model version and window;
+    a matching If-None-Match gets 304 Not Modified. Buffered responses are gzip or
+    brotli compressed according to Accept-Encoding.
+    """
     try:
-        from sqlalchemy import create_engine, text
-        from jobs.train_prophet import DatabaseConfig
-        import toml
-        
-        # Load config
-        with open('config/settings.toml', 'r') as f:
-            config = toml.load(f)
-        
-        db_config = DatabaseConfig(**config["database"])
-        engine = create_engine(db_config.url)
-        
-        # Get latest predictions
-        with engine.begin() as conn:
-            query = text("""
-                SELECT ds, yhat, yhat_lower, yhat_upper, model_version
-                FROM forecasts
-                WHERE product_id = :product_id
-                AND ds >= CURDATE()
-                ORDER BY ds
-                LIMIT 30
-            """)
-            
-            result = conn.execute(query, {"product_id": product_id})
-            predictions = []
-            
-            for row in result:
-                predictions.append({
-                    'date': str(row.ds),
-                    'predicted_price': float(row.yhat),
-                    'lower_bound': float(row.yhat_lower),
-                    'upper_bound': float(row.yhat_upper),
-                    'model_version': row.model_version
-                })
-            
+        window = _parse_prediction_window(request.args)
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        return _forecast_response([product_id], window, single=True)
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+    except Exception as e:
+        logger.error(f"Error getting predictions: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict', methods=['GET'])
+def get_batch_predictions():
+    """
+    Get active-model price predictions for several products at once.
+    
+    Takes ``product_ids`` (comma-separated) plus the same window and format
+    parameters as /predict/<product_id>. Columnar and binary formats add a
+    product_id column instead of nesting per product.
+    """
+    try:
+        product_ids = [int(pid) for pid in request.args.get('product_ids', '').split(',') if pid.strip()]
+        if not product_ids:
+            return jsonify({'error': 'product_ids is required'}), 400
+        if len(product_ids) > MAX_BATCH_PRODUCTS:
+            return jsonify({'error': f'At most {MAX_BATCH_PRODUCTS} products can be requested'}), 400
+        window = _parse_prediction_window(request.args)
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        return _forecast_response(list(dict.fromkeys(product_ids)), window, single=False)
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+    except Exception as e:
+        logger.error(f"Error getting batch predictions: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def _load_active_model(product_id: int):
+    """
+    Deserialized active model for a product, served from the in-memory cache.
+    
+    Returns:
+        (model, model_version), or (None, None) if the product has no stored artifact
+    """
+    from sqlalchemy import text
+    from prophet.serialize import model_from_json
+    
+    with get_engine().connect() as conn:
+        row = conn.execute(text("""
+            SELECT model_version, artifact_uri
+            FROM model_metadata
+            WHERE product_id = :product_id AND is_active = 1 AND artifact_uri IS NOT NULL
+            ORDER BY created_at DESC
+            LIMIT 1
+        """), {"product_id": product_id}).fetchone()
+    
+    if row is None:
+        return None, None
+    
+    store = get_artifact_store()
+    cache = get_model_cache(store.config.cache_size)
+    model = cache.get_or_load(
+        (product_id, row.model_version),
+        lambda: model_from_json(store.load(row.artifact_uri))
+    )
+    return model, row.model_version
+
+@app.route('/predict/<int:product_id>/on-demand', methods=['GET'])
+def get_on_demand_predictions(product_id: int):
+    """
+    Predict arbitrary dates from the product's stored model without refitting.
+    
+    Takes the same window and format parameters as /predict/<product_id>, but
+    the window is not limited to the precomputed forecast table. Streaming
+    (``ndjson``) is not offered since the whole window is predicted at once.
+    """
+    try:
+        window = _parse_prediction_window(request.args)
+        if window['format'] == 'ndjson':
+            raise UnsupportedFormat('ndjson is not available for on-demand predictions')
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        import pandas as pd
+        
+        model, model_version = _load_active_model(product_id)
+        if model is None:
+            return jsonify({'error': f'No stored model for product {product_id}'}), 404
+        
+        future = pd.DataFrame({'ds': pd.date_range(window['from'], window['to'], freq='D')})
+        forecast = model.predict(future)
+        rows = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].assign(ds=forecast['ds'].dt.date)
+        rows = list(rows.itertuples(index=False))
+        fmt = window['format']
+        
+        if fmt == 'json':
             return jsonify({
                 'status': 'success',
                 'product_id': product_id,
-                'predictions': predictions
+                'model_version': model_version,
+                'predictions': [
+                    {
+                        'date': str(row.ds),
+                        'predicted_price': float(row.yhat),
+                        'lower_bound': float(row.yhat_lower),
+                        'upper_bound': float(row.yhat_upper)
+                    }
+                    for row in rows
+                ]
             })
-            
+        
+        columns = forecast_columns(rows)
+        meta = {'product_id': product_id, 'model_version': model_version}
+        if fmt == 'arrow':
+            body = encode_arrow(columns, {key: json.dumps(value) for key, value in meta.items()})
+            return Response(body, mimetype=FORMAT_MIME_TYPES['arrow'])
+        
+        payload = {'status': 'success', **meta, 'count': len(rows), 'columns': jsonable_columns(columns)}
+        if fmt == 'msgpack':
+            return Response(encode_msgpack(payload), mimetype=FORMAT_MIME_TYPES['msgpack'])
+        return jsonify(payload)
+    
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
     except Exception as e:
-        logger.error(f"Error getting predictions: {e}")
+        logger.error(f"Error getting on-demand predictions: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.after_request
+def compress_prediction_response(response):
+    """
+    Compress forecast payloads for clients that accept gzip or brotli.
+    
+    Every /predict response (including 304s and streams) varies on Accept, since
+    the format is negotiated from it when no ``format`` parameter is given.
+    """
+    if request.path.startswith('/predict'):
+        response.vary.add('Accept')
+        return compress_response(response, request.accept_encodings)
+    return response
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get service statistics."""
     try:
         ingestion_job = DataIngestionJob()
         stats = ingestion_job.get_ingestion_stats()
+        stats['model_cache'] = get_model_cache(get_artifact_store().config.cache_size).stats()
         
         return jsonify({
             'status': 'success',